@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+"""
+Command-free authoring of prims directly on a layer.
+
+Authoring through the `CreatePrim` command records undo state, sends notifications and recomposes the stage for every
+prim. These helpers write the same specs with the Sdf API instead. Wrap a group of calls in an `Sdf.ChangeBlock` so
+the stages using the layer recompose once for the whole group.
+"""
+
+from pxr import Gf, Sdf, Usd, Vt
+
+
+def define_prim(layer: Sdf.Layer, prim_path: str, type_name: str, attributes: dict = None) -> Sdf.PrimSpec:
+    """
+    Author a prim `def` of `type_name` at `prim_path` on `layer`, creating its ancestors as `over`s when needed.
+
+    Args:
+        layer (Sdf.Layer): Layer to author on.
+        prim_path (str): Path of the prim.
+        type_name (str): Schema type of the prim, such as "Xform" or "DomeLight".
+        attributes (dict): Optional attribute values by name, as for the `CreatePrim` command. The value type of each
+            attribute is taken from the schema of `type_name`.
+    """
+    prim_spec = Sdf.CreatePrimInLayer(layer, prim_path)
+    prim_spec.specifier = Sdf.SpecifierDef
+    prim_spec.typeName = type_name
+
+    if attributes:
+        prim_definition = Usd.SchemaRegistry().FindConcretePrimDefinition(type_name)
+        for name, value in attributes.items():
+            schema_spec = prim_definition.GetSchemaAttributeSpec(name) if prim_definition else None
+            if not schema_spec:
+                raise ValueError(f"{type_name} has no attribute {name}")
+            set_attribute(prim_spec, name, schema_spec.typeName, value, schema_spec.variability)
+    return prim_spec
+
+
+def set_attribute(
+    prim_spec: Sdf.PrimSpec,
+    name: str,
+    type_name: Sdf.ValueTypeName,
+    value,
+    variability: Sdf.Variability = Sdf.VariabilityVarying,
+) -> Sdf.AttributeSpec:
+    """
+    Author the default `value` of attribute `name` of `prim_spec`, creating the attribute with `type_name` and
+    `variability` if needed.
+    """
+    attr_spec = prim_spec.attributes.get(name)
+    if not attr_spec:
+        attr_spec = Sdf.AttributeSpec(prim_spec, name, type_name, variability)
+    attr_spec.default = value
+    return attr_spec
+
+
+def set_xform_ops(
+    prim_spec: Sdf.PrimSpec,
+    translate=(0.0, 0.0, 0.0),
+    orient=None,
+    rotate_xyz=None,
+    scale=(1.0, 1.0, 1.0),
+) -> None:
+    """
+    Author double precision translate, rotate and scale ops on `prim_spec`, in that order.
+
+    The rotation is an `orient` quaternion, or `rotate_xyz` Euler angles in degrees when given. With neither, this is
+    the identity transform Kit gives new prims: a translate, an identity orient and a scale op.
+    """
+    set_attribute(prim_spec, "xformOp:translate", Sdf.ValueTypeNames.Double3, Gf.Vec3d(*translate))
+    if rotate_xyz is not None:
+        rotate_op = "xformOp:rotateXYZ"
+        set_attribute(prim_spec, rotate_op, Sdf.ValueTypeNames.Double3, Gf.Vec3d(*rotate_xyz))
+    else:
+        rotate_op = "xformOp:orient"
+        set_attribute(prim_spec, rotate_op, Sdf.ValueTypeNames.Quatd, orient or Gf.Quatd(1.0, 0.0, 0.0, 0.0))
+    set_attribute(prim_spec, "xformOp:scale", Sdf.ValueTypeNames.Double3, Gf.Vec3d(*scale))
+    set_attribute(
+        prim_spec,
+        "xformOpOrder",
+        Sdf.ValueTypeNames.TokenArray,
+        Vt.TokenArray(["xformOp:translate", rotate_op, "xformOp:scale"]),
+        Sdf.VariabilityUniform,
+    )
@@ -10,9 +10,11 @@
 
 import carb
 import omni.ext
-import omni.kit.commands
+import omni.usd
 from omni.kit.stage_templates import register_template, unregister_template
-from pxr import Gf, Sdf, Usd, UsdGeom, UsdLux
+from pxr import Sdf, UsdGeom, UsdLux
+
+from . import authoring
 
 
 class SunnySkyStage:
@@ -26,76 +28,61 @@ class SunnySkyStage:
         # Create basic DistantLight
         usd_context = omni.usd.get_context(usd_context_name)
         stage = usd_context.get_stage()
+        layer = stage.GetRootLayer()
         # get up axis
         up_axis = UsdGeom.GetStageUpAxis(stage)
-        with Usd.EditContext(stage, stage.GetRootLayer()):
-            # create Environment
-            omni.kit.commands.execute(
-                "CreatePrim",
-                prim_path="/Environment",
-                prim_type="Xform",
-                select_new_prim=False,
-                create_default_xform=True,
-                context_name=usd_context_name
-            )
 
-            texture_path = carb.tokens.get_tokens_interface().resolve("${dst.usd_explorer.setup}/data/light_rigs/HDR/partly_cloudy.hdr")
+        texture_path = carb.tokens.get_tokens_interface().resolve("${dst.usd_explorer.setup}/data/light_rigs/HDR/partly_cloudy.hdr")
+
+        # Author all prims directly on the root layer, the stage recomposes once at the end of the block
+        with Sdf.ChangeBlock():
+            # create Environment
+            prim_spec = authoring.define_prim(layer, "/Environment", "Xform")
+            authoring.set_xform_ops(prim_spec)
 
             # create Sky
-            omni.kit.commands.execute(
-                "CreatePrim",
-                prim_path="/Environment/Sky",
-                prim_type="DomeLight",
-                select_new_prim=False,
-                attributes={
-                            UsdLux.Tokens.inputsIntensity: 1000,
-                            UsdLux.Tokens.inputsTextureFile: texture_path,
-                            UsdLux.Tokens.inputsTextureFormat: UsdLux.Tokens.latlong,
-                            UsdLux.Tokens.inputsSpecular: 1,
-                            UsdGeom.Tokens.visibility: "inherited",
-                            } if hasattr(UsdLux.Tokens, 'inputsIntensity') else \
-                            {
-                            UsdLux.Tokens.intensity: 1000,
-                            UsdLux.Tokens.textureFile: texture_path,
-                            UsdLux.Tokens.textureFormat: UsdLux.Tokens.latlong,
-                            UsdGeom.Tokens.visibility: "inherited",
-                            },
-                create_default_xform=True,
-                context_name=usd_context_name
+            prim_spec = authoring.define_prim(
+                layer,
+                "/Environment/Sky",
+                "DomeLight",
+                {
+                    UsdLux.Tokens.inputsIntensity: 1000,
+                    UsdLux.Tokens.inputsTextureFile: texture_path,
+                    UsdLux.Tokens.inputsTextureFormat: UsdLux.Tokens.latlong,
+                    UsdLux.Tokens.inputsSpecular: 1,
+                    UsdGeom.Tokens.visibility: "inherited",
+                } if hasattr(UsdLux.Tokens, 'inputsIntensity') else {
+                    UsdLux.Tokens.intensity: 1000,
+                    UsdLux.Tokens.textureFile: texture_path,
+                    UsdLux.Tokens.textureFormat: UsdLux.Tokens.latlong,
+                    UsdGeom.Tokens.visibility: "inherited",
+                },
             )
-            prim = stage.GetPrimAtPath("/Environment/Sky")
-            prim.CreateAttribute("xformOp:scale", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(1, 1, 1))
-            prim.CreateAttribute("xformOp:translate", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(0, 0, 0))
             if up_axis == "Y":
-                prim.CreateAttribute("xformOp:rotateXYZ", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(270, 0, 0))
+                authoring.set_xform_ops(prim_spec, rotate_xyz=(270, 0, 0))
             else:
-                prim.CreateAttribute("xformOp:rotateXYZ", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(0, 0, 90))
-            prim.CreateAttribute("xformOpOrder", Sdf.ValueTypeNames.String, False).Set(["xformOp:translate", "xformOp:rotateXYZ", "xformOp:scale"])
+                authoring.set_xform_ops(prim_spec, rotate_xyz=(0, 0, 90))
 
             # create DistantLight
-            omni.kit.commands.execute(
-                "CreatePrim",
-                prim_path="/Environment/DistantLight",
-                prim_type="DistantLight",
-                select_new_prim=False,
-                attributes={
+            prim_spec = authoring.define_prim(
+                layer,
+                "/Environment/DistantLight",
+                "DistantLight",
+                {
                     UsdLux.Tokens.inputsAngle: 4.3,
                     UsdLux.Tokens.inputsIntensity: 3000,
                     UsdGeom.Tokens.visibility: "inherited",
-                    } if hasattr(UsdLux.Tokens, 'inputsIntensity') else \
-                    {
+                } if hasattr(UsdLux.Tokens, 'inputsIntensity') else {
                     UsdLux.Tokens.angle: 4.3,
                     UsdLux.Tokens.intensity: 3000,
                     UsdGeom.Tokens.visibility: "inherited",
-                    },
-                create_default_xform=True,
-                context_name=usd_context_name
+                },
             )
-            prim = stage.GetPrimAtPath("/Environment/DistantLight")
-            prim.CreateAttribute("xformOp:scale", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(1, 1, 1))
-            prim.CreateAttribute("xformOp:translate", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(0, 0, 0))
             if up_axis == "Y":
-                prim.CreateAttribute("xformOp:rotateXYZ", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(310.6366313590111, -125.93251524567805, 0.8821359067542289))
+                authoring.set_xform_ops(
+                    prim_spec, rotate_xyz=(310.6366313590111, -125.93251524567805, 0.8821359067542289)
+                )
             else:
-                prim.CreateAttribute("xformOp:rotateXYZ", Sdf.ValueTypeNames.Double3, False).Set(Gf.Vec3d(41.35092544555664, 0.517652153968811, -35.92928695678711))
-            prim.CreateAttribute("xformOpOrder", Sdf.ValueTypeNames.String, False).Set(["xformOp:translate", "xformOp:rotateXYZ", "xformOp:scale"])
+                authoring.set_xform_ops(
+                    prim_spec, rotate_xyz=(41.35092544555664, 0.517652153968811, -35.92928695678711)
+                )
@@ -0,0 +1,145 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a request cannot be admitted because the queue is full. `retry_after` is the estimated number of
+    seconds until the queue has room again.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many requests, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounds the number of requests served at the same time, and queues a bounded number of others.
+
+    Every request is admitted on behalf of a client. Queued requests are admitted round robin over the clients, so a
+    client sending a burst of requests only delays its own requests. Once `max_queued` requests are waiting, new ones
+    are rejected right away with a `QueueFullError`, unless they are not bounded, like the items of a batch that was
+    accepted already.
+
+    All methods are called from the main loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queued: int):
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_queued = max(0, max_queued)
+        self._running = 0
+        self._queued = 0
+        self._waiters: OrderedDict = OrderedDict()  # client -> deque of futures of its queued requests
+        self._average_duration = 1.0  # Moving average of the time requests are admitted for, in seconds
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def get_retry_after(self) -> int:
+        """
+        Estimated number of seconds until a new request could be queued.
+        """
+        return max(1, math.ceil((self._queued + 1) / self._max_concurrency * self._average_duration))
+
+    def check(self) -> None:
+        """
+        Raise a `QueueFullError` if a new request would be rejected.
+        """
+        if not self._has_free_slot() and self._queued >= self._max_queued:
+            raise QueueFullError(self.get_retry_after())
+
+    async def acquire(self, client: str, bounded: bool = True) -> None:
+        """
+        Wait until a request of `client` is admitted. Raises a `QueueFullError` if the queue is full, unless not
+        `bounded`.
+        """
+        if self._has_free_slot():
+            self._running += 1
+            return
+        if bounded and self._queued >= self._max_queued:
+            raise QueueFullError(self.get_retry_after())
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(client, deque()).append(future)
+        self._queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted while being cancelled, hand the slot to the next request
+                self.release()
+            else:
+                self._remove_waiter(client, future)
+            raise
+
+    def release(self, duration: float = None) -> None:
+        """
+        Release the slot of an admitted request, which was admitted for `duration` seconds if known, and admit the
+        next queued request.
+        """
+        if duration is not None:
+            self._average_duration += (duration - self._average_duration) * 0.1
+        while self._waiters:
+            client, waiters = next(iter(self._waiters.items()))
+            future = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                # The client goes to the back of the line for its next request
+                self._waiters.move_to_end(client)
+            else:
+                del self._waiters[client]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._running -= 1
+
+    def admit(self, client: str, bounded: bool = True):
+        """
+        Async context manager admitting a request of `client` for the duration of the block.
+        """
+        return _Admission(self, client, bounded)
+
+    def _has_free_slot(self) -> bool:
+        # Queued requests go first
+        return self._running < self._max_concurrency and not self._queued
+
+    def _remove_waiter(self, client: str, future: asyncio.Future) -> None:
+        waiters = self._waiters.get(client)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            self._queued -= 1
+            if not waiters:
+                del self._waiters[client]
+
+
+class _Admission:
+    def __init__(self, controller: AdmissionController, client: str, bounded: bool):
+        self._controller = controller
+        self._client = client
+        self._bounded = bounded
+        self._start = 0.0
+
+    async def __aenter__(self):
+        await self._controller.acquire(self._client, self._bounded)
+        self._start = time.perf_counter()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._controller.release(time.perf_counter() - self._start)
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import carb
+import omni.usd
+
+
+class UsdContextPool:
+    """
+    A fixed set of named USD contexts, leased to one request at a time.
+
+    The contexts are created once, so a request only pays for opening a stage in a warm context. While one request
+    waits on the IO of its stage, the others keep authoring in their own contexts. Requests wait for a free context
+    when all are leased.
+
+    Raises a RuntimeError if none of the contexts could be created.
+    """
+
+    def __init__(self, size: int, name_prefix: str):
+        self._names = []
+        self._free: asyncio.Queue = asyncio.Queue()
+        for index in range(max(1, size)):
+            name = f"{name_prefix}_{index}"
+            if not omni.usd.create_context(name):
+                carb.log_warn(f"Failed to create USD context {name}")
+                continue
+            self._names.append(name)
+            self._free.put_nowait(name)
+        if not self._names:
+            raise RuntimeError(f"Failed to create any USD context for the pool {name_prefix}")
+
+    @property
+    def names(self) -> list:
+        return list(self._names)
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        Async context manager leasing a free context for the duration of the block. The stage opened in the context
+        during the block is closed when it exits.
+        """
+        name = await self._free.get()
+        usd_context = omni.usd.get_context(name)
+        try:
+            yield usd_context
+        finally:
+            try:
+                # Do not keep the content of the request alive until the next lease
+                if usd_context.get_stage():
+                    await usd_context.close_stage_async()
+            finally:
+                self._free.put_nowait(name)
+
+    def destroy(self) -> None:
+        """
+        Destroy the contexts of the pool. No context may be leased anymore.
+        """
+        for name in self._names:
+            omni.usd.destroy_context(name)
+        self._names = []
@@ -9,7 +9,9 @@
 # its affiliates is strictly prohibited.
 
 import omni.ext
+import omni.kit.app
 from omni.services.core import main
+from . import service
 from .service import router
 
 
@@ -21,10 +23,13 @@ class MyExtension(omni.ext.IExt):
     # query additional information, like where this extension is located on the filesystem.
     def on_startup(self, ext_id):
 
+        ext_dict = omni.kit.app.get_app().get_extension_manager().get_extension_dict(ext_id)
+        service.startup(ext_dict["package"]["version"])
         main.register_router(router)
 
         print("[{{ extension_name }}] MyExtension startup : Local Docs -  http://localhost:8011/docs")
 
     def on_shutdown(self):
         main.deregister_router(router)
+        service.shutdown()
         print("[{{ extension_name }}] MyExtension shutdown")
\ No newline at end of file
@@ -0,0 +1,168 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+"""
+Request and phase metrics of the service, rendered in the Prometheus text exposition format.
+
+Phases are timed from the export thread pool as well as from the main loop, so all updates hold a lock.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Prefix of the names of all metrics of the service.
+METRIC_PREFIX = "service"
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, with a count and sum like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+_lock = threading.Lock()
+_requests = defaultdict(int)  # endpoint -> number of requests received
+_in_flight = defaultdict(int)  # endpoint -> number of requests being served
+_request_latency = defaultdict(Histogram)  # endpoint -> latency of whole requests
+_phase_latency = defaultdict(Histogram)  # phase -> latency of the phase
+_cache_requests = defaultdict(int)  # "hit" or "miss" -> number of result cache lookups
+_rejected = defaultdict(int)  # endpoint -> number of requests rejected because the queue was full
+_queued = 0  # Number of requests waiting to be served
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """
+    Count a request to `endpoint`, keep it in the in-flight gauge and record its latency until the block exits.
+    """
+    with _lock:
+        _requests[endpoint] += 1
+        _in_flight[endpoint] += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _in_flight[endpoint] -= 1
+            _request_latency[endpoint].observe(elapsed)
+
+
+@contextmanager
+def time_phase(phase: str):
+    """
+    Record the time spent in the block in the latency histogram of `phase`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _phase_latency[phase].observe(elapsed)
+
+
+def count_cache_request(hit: bool) -> None:
+    with _lock:
+        _cache_requests["hit" if hit else "miss"] += 1
+
+
+def count_rejected_request(endpoint: str) -> None:
+    with _lock:
+        _rejected[endpoint] += 1
+
+
+def set_queued_requests(count: int) -> None:
+    global _queued
+    with _lock:
+        _queued = count
+
+
+def reset() -> None:
+    global _queued
+    with _lock:
+        _requests.clear()
+        _in_flight.clear()
+        _request_latency.clear()
+        _phase_latency.clear()
+        _cache_requests.clear()
+        _rejected.clear()
+        _queued = 0
+
+
+def _sample(name: str, labels: dict, value) -> str:
+    label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+    return name + "{" + label_text + "} " + str(value)
+
+
+def _format_histogram(name: str, labels: dict, histogram: Histogram) -> list:
+    lines = []
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(_sample(f"{name}_bucket", dict(labels, le=str(bound)), count))
+    lines.append(_sample(f"{name}_bucket", dict(labels, le="+Inf"), histogram.count))
+    lines.append(_sample(f"{name}_sum", labels, histogram.sum))
+    lines.append(_sample(f"{name}_count", labels, histogram.count))
+    return lines
+
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        name = f"{METRIC_PREFIX}_requests_total"
+        lines += [f"# HELP {name} Number of requests received.", f"# TYPE {name} counter"]
+        lines += [_sample(name, {"endpoint": endpoint}, count) for endpoint, count in sorted(_requests.items())]
+
+        name = f"{METRIC_PREFIX}_requests_in_flight"
+        lines += [f"# HELP {name} Number of requests being served.", f"# TYPE {name} gauge"]
+        lines += [_sample(name, {"endpoint": endpoint}, count) for endpoint, count in sorted(_in_flight.items())]
+
+        name = f"{METRIC_PREFIX}_requests_rejected_total"
+        lines += [f"# HELP {name} Number of requests rejected because the queue was full.", f"# TYPE {name} counter"]
+        lines += [_sample(name, {"endpoint": endpoint}, count) for endpoint, count in sorted(_rejected.items())]
+
+        name = f"{METRIC_PREFIX}_requests_queued"
+        lines += [f"# HELP {name} Number of requests waiting to be served.", f"# TYPE {name} gauge"]
+        lines.append(f"{name} {_queued}")
+
+        name = f"{METRIC_PREFIX}_request_duration_seconds"
+        lines += [f"# HELP {name} Latency of requests.", f"# TYPE {name} histogram"]
+        for endpoint, histogram in sorted(_request_latency.items()):
+            lines += _format_histogram(name, {"endpoint": endpoint}, histogram)
+
+        name = f"{METRIC_PREFIX}_phase_duration_seconds"
+        lines += [f"# HELP {name} Latency of the phases of generating an asset.", f"# TYPE {name} histogram"]
+        for phase, histogram in sorted(_phase_latency.items()):
+            lines += _format_histogram(name, {"phase": phase}, histogram)
+
+        name = f"{METRIC_PREFIX}_result_cache_requests_total"
+        lines += [f"# HELP {name} Number of result cache lookups.", f"# TYPE {name} counter"]
+        lines += [_sample(name, {"result": result}, count) for result, count in sorted(_cache_requests.items())]
+    return "\n".join(lines) + "\n"
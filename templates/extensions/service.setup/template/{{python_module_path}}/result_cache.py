@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Prefix of the names of the files of the cache. Other files of its directory are left alone.
+RESULT_FILE_PREFIX = "result_"
+
+
+def get_request_key(request: dict, version: str) -> str:
+    """
+    Content address of the result of `request`, a dictionary of the request fields that affect the generated content.
+
+    The fields are serialized with sorted keys, so the key does not depend on their order. The extension `version` is
+    part of the key, so results generated by another version of the service are not reused.
+    """
+    normalized = json.dumps({"request": request, "version": version}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _get_name(key: str, extension: str) -> str:
+    return f"{RESULT_FILE_PREFIX}{key}.{extension}"
+
+
+class ResultCache:
+    """
+    On-disk store of generated assets, addressed by request key.
+
+    Each result is a file named after its key and extension in `directory`, with the `RESULT_FILE_PREFIX`. Only these
+    files are managed by the cache. Entries found in the directory at creation are kept, ordered by modification time.
+    When the files exceed `max_bytes`, the least recently used are deleted.
+    All methods do file IO and are meant to run on a worker thread, they may be called from several threads at once.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._directory = Path(directory)
+        self._max_bytes = max(0, max_bytes)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()  # file name -> size in bytes
+        self._size = 0
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        files = [
+            entry
+            for entry in os.scandir(self._directory)
+            if entry.is_file() and entry.name.startswith(RESULT_FILE_PREFIX)
+        ]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            if entry.name.endswith(".tmp"):
+                # Left over by an interrupted write
+                os.remove(entry.path)
+                continue
+            self._entries[entry.name] = entry.stat().st_size
+            self._size += entry.stat().st_size
+        with self._lock:
+            self._evict()
+
+    def get(self, key: str, extension: str) -> str:
+        """
+        Path of the cached result for `key`, or None if it is not cached. The result becomes the most recently used.
+        """
+        name = _get_name(key, extension)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = self._directory.joinpath(name)
+        try:
+            # Keep the recency across restarts
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._forget(name)
+            return None
+        return str(path)
+
+    def put_file(self, key: str, extension: str, file_path: str) -> None:
+        """
+        Store a copy of the file at `file_path` as the result for `key`.
+        """
+        self._store(_get_name(key, extension), lambda tmp_path: shutil.copyfile(file_path, tmp_path))
+
+    def put_bytes(self, key: str, extension: str, content: bytes) -> None:
+        """
+        Store `content` as the result for `key`.
+        """
+        self._store(_get_name(key, extension), lambda tmp_path: Path(tmp_path).write_bytes(content))
+
+    def clear(self) -> None:
+        with self._lock:
+            for name in list(self._entries):
+                self._remove(name)
+
+    def _store(self, name: str, write) -> None:
+        path = self._directory.joinpath(name)
+        # Write next to the entry first, so readers never see a partial file
+        tmp_path = path.with_name(f"{name}.{threading.get_ident()}.tmp")
+        try:
+            write(str(tmp_path))
+            size = tmp_path.stat().st_size
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = size
+            self._size += size
+            self._evict()
+
+    def _forget(self, name: str) -> None:
+        self._size -= self._entries.pop(name, 0)
+
+    def _remove(self, name: str) -> None:
+        self._forget(name)
+        try:
+            os.remove(self._directory.joinpath(name))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self._size > self._max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
@@ -8,16 +8,67 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 
+import asyncio
+import json
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from enum import Enum
 from pathlib import Path
-import omni.usd
-import omni.kit.commands
+from typing import List
+
+import carb.settings
+import carb.tokens
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pxr import Gf, Sdf, Tf, UsdGeom, UsdUtils, Vt
 from pydantic import BaseModel, Field
 from omni.services.core.routers import ServiceAPIRouter
 
+from . import authoring, metrics
+from .admission import AdmissionController, QueueFullError
+from .context_pool import UsdContextPool
+from .result_cache import ResultCache, get_request_key
+
+# Number of threads exporting generated layers, which is where most of the time of a request goes.
+EXPORT_WORKERS_SETTING = "/exts/{{ extension_name }}/exportWorkers"
+# Directory of the on-disk cache of generated assets, may hold tokens.
+RESULT_CACHE_PATH_SETTING = "/exts/{{ extension_name }}/resultCachePath"
+# Size of the result cache in megabytes, 0 disables the cache.
+RESULT_CACHE_SIZE_SETTING = "/exts/{{ extension_name }}/resultCacheSize"
+# Number of generation requests served at the same time.
+MAX_CONCURRENT_REQUESTS_SETTING = "/exts/{{ extension_name }}/maxConcurrentRequests"
+# Number of generation requests waiting to be served before new ones are rejected with a 429.
+MAX_QUEUED_REQUESTS_SETTING = "/exts/{{ extension_name }}/maxQueuedRequests"
+# Header identifying the client of a request for fair scheduling, the client address is used when it is missing.
+CLIENT_ID_HEADER_SETTING = "/exts/{{ extension_name }}/clientIdHeader"
+# Number of named USD contexts requests build their content in, 0 builds it on private layers without a context.
+USD_CONTEXT_POOL_SIZE_SETTING = "/exts/{{ extension_name }}/usdContextPoolSize"
+# Up axis and meters per unit omni.usd gives a new stage.
+UP_AXIS_SETTING = "/persistent/app/stage/upAxis"
+METERS_PER_UNIT_SETTING = "/persistent/simulation/defaultMetersPerUnit"
+
 
 router = ServiceAPIRouter(tags=["{{ extension_display_name }}"])
 
 
+class OutputFormat(str, Enum):
+    """File format of generated assets."""
+
+    USDA = "usda"  # Text, readable but the largest and slowest to parse
+    USDC = "usdc"  # Binary crate, the fastest to write and read
+    USDZ = "usdz"  # Zip package holding a usdc layer, for delivering a single file
+
+
+# Media type of the response body when the content of an asset is returned instead of written
+MEDIA_TYPES = {
+    OutputFormat.USDA: "model/vnd.usda",
+    OutputFormat.USDC: "application/octet-stream",
+    OutputFormat.USDZ: "model/vnd.usdz+zip",
+}
+
+
 class CubeDataModel(BaseModel):
     """Model of a request for generating a cube."""
 
@@ -30,7 +81,7 @@ class CubeDataModel(BaseModel):
     asset_name: str = Field(
         default="cube",
         title="Asset Name",
-        description="Name of the asset to be generated, .usda will be appended to the name",
+        description="Name of the asset to be generated, the extension of the output format will be appended",
     )
 
     cube_scale: float = Field(
@@ -39,41 +90,514 @@ class CubeDataModel(BaseModel):
         description="Scale of the cube",
     )
 
+    output_format: OutputFormat = Field(
+        default=OutputFormat.USDC,
+        title="Output Format",
+        description="File format of the generated asset",
+    )
 
-@router.post(
-    "/generate_cube",
-    summary="Generate a cube",
-    description="An endpoint to generate a usda file containing a cube of given scale",
-)
-async def generate_cube(cube_data: CubeDataModel):
-    print("[{{ extension_name }}] generate_cube was called")
+    return_content: bool = Field(
+        default=False,
+        title="Return Content",
+        description="Return the content of the asset in the response instead of writing it to the asset path",
+    )
+
+
+class CubeBatchDataModel(BaseModel):
+    """Model of a request for generating many cubes at once."""
+
+    cubes: List[CubeDataModel] = Field(
+        default=[],
+        title="Cubes",
+        description="Cubes to generate, their content is always written and never returned",
+    )
+
+    single_layer: bool = Field(
+        default=False,
+        title="Single Layer",
+        description="Write all cubes as prims of one layer instead of one layer per cube",
+    )
+
+    asset_write_location: str = Field(
+        default="/asset_write_path",
+        title="Asset Path",
+        description="Location on device to write the layer to, when writing a single layer",
+    )
+
+    asset_name: str = Field(
+        default="cubes",
+        title="Asset Name",
+        description="Name of the layer, when writing a single layer, the extension of the format will be appended",
+    )
+
+    output_format: OutputFormat = Field(
+        default=OutputFormat.USDC,
+        title="Output Format",
+        description="File format of the layer, when writing a single layer",
+    )
+
+
+_executor: ThreadPoolExecutor = None
+_export_workers = 1
+_result_cache: ResultCache = None
+_admission: AdmissionController = None
+_context_pool: UsdContextPool = None
+_version = ""
+
+
+def startup(version: str) -> None:
+    """
+    Create the thread pool exporting generated layers and the cache of results generated by this `version` of the
+    extension.
+    """
+    global _executor, _export_workers, _result_cache, _admission, _context_pool, _version
+    settings = carb.settings.get_settings()
+    _export_workers = max(1, settings.get_as_int(EXPORT_WORKERS_SETTING))
+    _executor = ThreadPoolExecutor(max_workers=_export_workers, thread_name_prefix="{{ extension_name }}")
+    _admission = AdmissionController(
+        settings.get_as_int(MAX_CONCURRENT_REQUESTS_SETTING), settings.get_as_int(MAX_QUEUED_REQUESTS_SETTING)
+    )
+    pool_size = settings.get_as_int(USD_CONTEXT_POOL_SIZE_SETTING)
+    if pool_size > 0:
+        try:
+            _context_pool = UsdContextPool(pool_size, "{{ extension_name }}")
+        except RuntimeError as e:
+            # Layers are then built in memory, without a USD context
+            carb.log_warn(f"{e}, building layers without the USD context pool")
+
+    _version = version
+    cache_size = settings.get_as_int(RESULT_CACHE_SIZE_SETTING)
+    if cache_size > 0:
+        cache_path = carb.tokens.get_tokens_interface().resolve(settings.get_as_string(RESULT_CACHE_PATH_SETTING))
+        _result_cache = ResultCache(cache_path, cache_size * 1024 * 1024)
+
+
+def shutdown() -> None:
+    """
+    Shut the export thread pool down, letting running exports finish.
+    """
+    global _executor, _result_cache, _admission, _context_pool
+    if _executor:
+        _executor.shutdown(wait=True)
+        _executor = None
+    if _context_pool:
+        _context_pool.destroy()
+        _context_pool = None
+    _result_cache = None
+    _admission = None
+
+
+def get_stage_metrics() -> tuple:
+    """
+    Up axis and meters per unit of a new stage, from the omni.usd settings.
+    """
+    settings = carb.settings.get_settings()
+    up_axis = UsdGeom.Tokens.z if settings.get_as_string(UP_AXIS_SETTING).upper() == "Z" else UsdGeom.Tokens.y
+    return up_axis, settings.get_as_float(METERS_PER_UNIT_SETTING) or 0.01
+
+
+def setup_layer(layer: Sdf.Layer) -> None:
+    """
+    Give `layer` the same metrics as a new stage of the USD context, and a `/World` default prim.
+
+    The metrics follow the omni.usd settings a new stage is created with.
+    """
+    up_axis, meters_per_unit = get_stage_metrics()
+    with Sdf.ChangeBlock():
+        layer.pseudoRoot.SetInfo(UsdGeom.Tokens.upAxis, up_axis)
+        layer.pseudoRoot.SetInfo(UsdGeom.Tokens.metersPerUnit, meters_per_unit)
+
+        # Set the default prim
+        authoring.define_prim(layer, "/World", "Xform")
+        layer.defaultPrim = "World"
+
+
+def create_layer() -> Sdf.Layer:
+    """
+    Create an anonymous layer set up like a new stage of the USD context.
+
+    Every request builds its content on its own layer, so concurrent requests do not interfere with each other or with
+    the stage of the USD context. No stage is composed, the content is authored and exported at the Sdf level.
+    """
+    layer = Sdf.Layer.CreateAnonymous(".usda")
+    setup_layer(layer)
+    return layer
+
+
+@asynccontextmanager
+async def lease_layer():
+    """
+    Async context manager providing the layer a request builds its content on, for the duration of the block.
+
+    This is a private anonymous layer, or the root layer of a new stage in a context leased from the USD context pool
+    when the pool is enabled. Building in a context lets extensions observing the context stage take part.
+    """
+    if not _context_pool:
+        with metrics.time_phase("stage_creation"):
+            layer = create_layer()
+        yield layer
+        return
+
+    async with _context_pool.lease() as usd_context:
+        with metrics.time_phase("stage_creation"):
+            result, error = await usd_context.new_stage_async()
+            if not result:
+                raise RuntimeError(f"Failed to create a stage in USD context {usd_context.get_name()}: {error}")
+            layer = usd_context.get_stage().GetRootLayer()
+            setup_layer(layer)
+        yield layer
+
+
+def author_cube(layer: Sdf.Layer, prim_path: str, size: float) -> None:
+    """
+    Define a cube of the given `size` at `prim_path`, with the default transform operations Kit gives new prims.
+
+    Call it inside an `Sdf.ChangeBlock` when authoring many cubes.
+    """
+    half = size * 0.5
+    prim_spec = authoring.define_prim(
+        layer,
+        prim_path,
+        "Cube",
+        {
+            UsdGeom.Tokens.size: size,
+            UsdGeom.Tokens.extent: Vt.Vec3fArray([Gf.Vec3f(-half, -half, -half), Gf.Vec3f(half, half, half)]),
+        },
+    )
+    authoring.set_xform_ops(prim_spec)
+
+
+def _export(layer: Sdf.Layer, file_path: str) -> None:
+    """
+    Write `layer` to `file_path`, in the format given by the extension of the path.
+    """
+    if Path(file_path).suffix == ".usdz":
+        # A package is made of files, so write the layer as usdc next to it first. The layer has the same name in
+        # every package, so a package does not depend on the name of its file and can be served from the cache.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            layer_path = str(Path(tmp_dir).joinpath("layer.usdc"))
+            _export(layer, layer_path)
+            if not UsdUtils.CreateNewUsdzPackage(Sdf.AssetPath(layer_path), file_path):
+                raise RuntimeError(f"Failed to package layer to {file_path}")
+    elif not layer.Export(file_path):
+        raise RuntimeError(f"Failed to export layer to {file_path}")
 
-    # Create a new stage
-    usd_context = omni.usd.get_context()
-    usd_context.new_stage()
-    stage = omni.usd.get_context().get_stage()
 
-    # Set the default prim
-    default_prim_path = "/World"
-    stage.DefinePrim(default_prim_path, "Xform")
-    prim = stage.GetPrimAtPath(default_prim_path)
-    stage.SetDefaultPrim(prim)
+def _export_to_bytes(layer: Sdf.Layer, output_format: OutputFormat) -> bytes:
+    if output_format == OutputFormat.USDA:
+        return layer.ExportToString().encode()
+    # The binary formats can only be written to files
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir).joinpath(f"layer.{output_format.value}")
+        _export(layer, str(file_path))
+        return file_path.read_bytes()
 
+
+def _timed_export(export, *args):
+    # Timed on the worker, so the export phase does not include the time spent waiting for a free worker
+    with metrics.time_phase("export"):
+        return export(*args)
+
+
+async def export_layer(layer: Sdf.Layer, file_path: str) -> None:
+    """
+    Export `layer` to `file_path` on the export thread pool, so the main loop keeps serving other requests.
+
+    The format is given by the extension of `file_path`.
+    """
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(_executor, _timed_export, _export, layer, file_path)
+
+
+async def export_layer_to_bytes(layer: Sdf.Layer, output_format: OutputFormat) -> bytes:
+    """
+    Serialize `layer` in `output_format` on the export thread pool and return its content.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(_executor, _timed_export, _export_to_bytes, layer, output_format)
+
+
+def get_asset_file_path(asset_write_location: str, asset_name: str, output_format: OutputFormat) -> str:
+    return str(Path(asset_write_location).joinpath(f"{asset_name}.{output_format.value}"))
+
+
+def get_client_id(request: Request) -> str:
+    """
+    Identity of the client sending `request`, used to schedule the requests of all clients fairly.
+    """
+    if request is None:
+        return ""
+    client_id = request.headers.get(carb.settings.get_settings().get_as_string(CLIENT_ID_HEADER_SETTING))
+    if client_id:
+        return client_id
+    return request.client.host if request.client else ""
+
+
+def _reject(endpoint: str, error: QueueFullError) -> HTTPException:
+    metrics.count_rejected_request(endpoint)
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+@asynccontextmanager
+async def admitted(endpoint: str, client: str, bounded: bool = True):
+    """
+    Async context manager serving a request of `client` to `endpoint` for the duration of the block, once admitted.
+    The request is rejected with a 429 when too many requests are queued, unless not `bounded`.
+    """
+    try:
+        async with _admission.admit(client, bounded):
+            metrics.set_queued_requests(_admission.queued)
+            yield
+    except QueueFullError as e:
+        raise _reject(endpoint, e)
+    finally:
+        metrics.set_queued_requests(_admission.queued)
+
+
+def get_cube_key(cube_data: CubeDataModel) -> str:
+    """
+    Result cache key of `cube_data`. Only the fields that change the generated content are part of it, not where the
+    content is delivered.
+    """
+    up_axis, meters_per_unit = get_stage_metrics()
+    request = {
+        "prim_type": "Cube",
+        "cube_scale": cube_data.cube_scale,
+        "output_format": cube_data.output_format.value,
+        "up_axis": str(up_axis),
+        "meters_per_unit": meters_per_unit,
+    }
+    return get_request_key(request, _version)
+
+
+def _copy_from_cache(key: str, extension: str, file_path: str) -> bool:
+    cached_path = _result_cache.get(key, extension)
+    if not cached_path:
+        return False
+    try:
+        shutil.copyfile(cached_path, file_path)
+    except FileNotFoundError:
+        # Evicted by another request in the meantime
+        return False
+    return True
+
+
+def _read_from_cache(key: str, extension: str) -> bytes:
+    cached_path = _result_cache.get(key, extension)
+    if not cached_path:
+        return None
+    try:
+        return Path(cached_path).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+async def _run_cache_io(function, *args):
+    # Cache file IO runs on the default pool, so it never waits behind exports
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, function, *args)
+
+
+def build_cube(layer: Sdf.Layer, cube_data: CubeDataModel) -> None:
+    """
+    Generate a single cube on `layer`.
+    """
     # Create cube
     prim_type = "Cube"
     prim_path = f"/World/{prim_type}"
+    with metrics.time_phase("authoring"):
+        author_cube(layer, prim_path, cube_data.cube_scale)
+
 
-    omni.kit.commands.execute(
-        "CreatePrim",
-        prim_path=prim_path,
-        prim_type=prim_type,
-        attributes={"size": cube_data.cube_scale},
-        select_new_prim=False,
+async def write_cube(cube_data: CubeDataModel) -> str:
+    """
+    Write the layer of a single cube and return the path it was written to.
+
+    A cube generated before is copied from the result cache, without any USD work.
+    """
+    asset_file_path = get_asset_file_path(
+        cube_data.asset_write_location, cube_data.asset_name, cube_data.output_format
     )
+    extension = cube_data.output_format.value
+    key = get_cube_key(cube_data) if _result_cache else None
+    if key:
+        copied = await _run_cache_io(_copy_from_cache, key, extension, asset_file_path)
+        metrics.count_cache_request(copied)
+        if copied:
+            return asset_file_path
+
+    # Create a new layer, private to this request
+    async with lease_layer() as layer:
+        build_cube(layer, cube_data)
+
+        # save layer
+        await export_layer(layer, asset_file_path)
+    if key:
+        await _run_cache_io(_result_cache.put_file, key, extension, asset_file_path)
+    return asset_file_path
+
+
+async def read_cube(cube_data: CubeDataModel) -> bytes:
+    """
+    Generate the layer of a single cube and return its content, from the result cache if it was generated before.
+    """
+    extension = cube_data.output_format.value
+    key = get_cube_key(cube_data) if _result_cache else None
+    if key:
+        content = await _run_cache_io(_read_from_cache, key, extension)
+        metrics.count_cache_request(content is not None)
+        if content is not None:
+            return content
 
-    # save stage
-    asset_file_path = str(Path(cube_data.asset_write_location).joinpath(f"{cube_data.asset_name}.usda"))
-    stage.GetRootLayer().Export(asset_file_path)
+    async with lease_layer() as layer:
+        build_cube(layer, cube_data)
+        content = await export_layer_to_bytes(layer, cube_data.output_format)
+    if key:
+        await _run_cache_io(_result_cache.put_bytes, key, extension, content)
+    return content
+
+
+async def write_cubes_to_layer(batch_data: CubeBatchDataModel, client: str):
+    """
+    Generate all cubes of `batch_data` as prims of one layer, named after their assets, and yield one result per cube
+    once the layer is written.
+
+    The layer is exported once, so it is admitted as a single request of `client`.
+    """
+    asset_file_path = get_asset_file_path(
+        batch_data.asset_write_location, batch_data.asset_name, batch_data.output_format
+    )
+    prim_paths = []
+    try:
+        async with admitted("/generate_cubes", client, bounded=False), lease_layer() as layer:
+            with metrics.time_phase("authoring"), Sdf.ChangeBlock():
+                for cube_data in batch_data.cubes:
+                    name = Tf.MakeValidIdentifier(cube_data.asset_name)
+                    prim_path = f"/World/{name}"
+                    suffix = 1
+                    while layer.GetPrimAtPath(prim_path):
+                        prim_path = f"/World/{name}_{suffix}"
+                        suffix += 1
+                    author_cube(layer, prim_path, cube_data.cube_scale)
+                    prim_paths.append(prim_path)
+
+            await export_layer(layer, asset_file_path)
+    except Exception as e:
+        for index in range(len(batch_data.cubes)):
+            yield {"index": index, "error": str(e)}
+        return
+    for index, prim_path in enumerate(prim_paths):
+        yield {"index": index, "path": asset_file_path, "prim_path": prim_path}
+
+
+async def write_cubes_to_layers(batch_data: CubeBatchDataModel, client: str):
+    """
+    Generate one layer per cube of `batch_data`, exporting them in parallel on the export thread pool, and yield the
+    result of each cube as soon as its layer is written.
+
+    Each cube is admitted as a request of `client`, so a batch waits its turn between cubes like a client sending
+    requests one by one. As many cubes as there are export workers are in flight at a time, so a large batch neither
+    authors all its layers in one go nor holds them all in memory while they wait for an export worker.
+    """
+    cubes = iter(enumerate(batch_data.cubes))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        # The workers share the iterator, each takes the next cube once done with its previous one
+        for index, cube_data in cubes:
+            try:
+                async with admitted("/generate_cubes", client, bounded=False):
+                    path = await write_cube(cube_data)
+                results.put_nowait({"index": index, "path": path})
+            except Exception as e:
+                results.put_nowait({"index": index, "error": str(e)})
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(_export_workers, len(batch_data.cubes)))]
+    try:
+        for _ in batch_data.cubes:
+            yield await results.get()
+    finally:
+        # The client went away, do not write the remaining layers
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+@router.post(
+    "/generate_cube",
+    summary="Generate a cube",
+    description=(
+        "An endpoint to generate a usd file containing a cube of given scale. With `return_content` set, the file is "
+        "returned as the response body instead of being written to the asset path."
+    ),
+)
+async def generate_cube(cube_data: CubeDataModel, request: Request = None):
+    print("[{{ extension_name }}] generate_cube was called")
+    with metrics.track_request("/generate_cube"):
+        async with admitted("/generate_cube", get_client_id(request)):
+            return await _generate_cube(cube_data)
+
+
+async def _generate_cube(cube_data: CubeDataModel):
+    if cube_data.return_content:
+        content = await read_cube(cube_data)
+        file_name = f"{cube_data.asset_name}.{cube_data.output_format.value}"
+        return Response(
+            content=content,
+            media_type=MEDIA_TYPES[cube_data.output_format],
+            headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+        )
+
+    asset_file_path = await write_cube(cube_data)
     msg = f"[{{ extension_name }}] Wrote a cube to this path: {asset_file_path}"
     print(msg)
     return msg
+
+
+@router.post(
+    "/generate_cubes",
+    summary="Generate many cubes",
+    description=(
+        "An endpoint to generate a list of cubes, either as one usd file per cube or as prims of a single usd file. "
+        "The result of each cube is streamed back as a line of JSON (NDJSON) as soon as it is written, holding the "
+        "`index` of the cube in the request and either the `path` it was written to or an `error`."
+    ),
+)
+async def generate_cubes(batch_data: CubeBatchDataModel, request: Request = None):
+    print(f"[{{ extension_name }}] generate_cubes was called with {len(batch_data.cubes)} cubes")
+    # Checked before streaming starts, so a full queue can still be answered with a 429. The cubes of an accepted batch
+    # are then admitted one by one as they are generated.
+    try:
+        _admission.check()
+    except QueueFullError as e:
+        # Counted like a rejected /generate_cube, whose whole request is tracked
+        with metrics.track_request("/generate_cubes"):
+            raise _reject("/generate_cubes", e)
+    client = get_client_id(request)
+    if batch_data.single_layer:
+        results = write_cubes_to_layer(batch_data, client)
+    else:
+        results = write_cubes_to_layers(batch_data, client)
+
+    async def stream():
+        # The request is in flight until the last result is streamed
+        with metrics.track_request("/generate_cubes"):
+            try:
+                async for result in results:
+                    yield json.dumps(result) + "\n"
+            finally:
+                await results.aclose()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/metrics",
+    summary="Service metrics",
+    description=(
+        "Request counts, requests in flight and latency histograms of requests and of their stage creation, "
+        "authoring and export phases, in the Prometheus text format"
+    ),
+)
+async def get_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
@@ -9,8 +9,17 @@
 # its affiliates is strictly prohibited.
 
 import asyncio
+import time
 
+import omni.kit.commands
+import omni.usd
 from omni.kit.test import AsyncTestCase, BenchmarkTestCase
+from pxr import Sdf, Usd
+
+from ..service import author_cube, create_layer
+
+# Number of prims authored by the authoring benchmarks.
+PRIM_COUNT = 1000
 
 
 class TestBenchmarks(BenchmarkTestCase):
@@ -59,3 +68,50 @@ class TestBenchmarksNoCustomMetric(AsyncTestCase):
 
     async def benchmark_sleepy_no_custom(self):
         await asyncio.sleep(0.1)
+
+
+class TestAuthoringBenchmarks(BenchmarkTestCase):
+    """
+    Per-prim cost of authoring cubes through the `CreatePrim` command, the Usd API and the Sdf authoring helpers.
+    """
+
+    def _report(self, name: str, start: float) -> None:
+        self.set_metric_sample(name=name, value=(time.perf_counter() - start) * 1e6 / PRIM_COUNT, unit="us")
+
+    async def benchmark_create_prim_command(self):
+        usd_context = omni.usd.get_context()
+        await usd_context.new_stage_async()
+
+        start = time.perf_counter()
+        for i in range(PRIM_COUNT):
+            omni.kit.commands.execute(
+                "CreatePrim",
+                prim_path=f"/World/Cube_{i}",
+                prim_type="Cube",
+                select_new_prim=False,
+                attributes={"size": 100.0},
+            )
+        self._report("create_prim_command_per_prim", start)
+
+        await usd_context.close_stage_async()
+
+    async def benchmark_usd_api(self):
+        stage = Usd.Stage.CreateInMemory()
+
+        start = time.perf_counter()
+        for i in range(PRIM_COUNT):
+            prim = stage.DefinePrim(f"/World/Cube_{i}", "Cube")
+            prim.GetAttribute("size").Set(100.0)
+        self._report("usd_api_per_prim", start)
+
+    async def benchmark_sdf_authoring(self):
+        layer = create_layer()
+        stage = Usd.Stage.Open(layer)
+
+        start = time.perf_counter()
+        with Sdf.ChangeBlock():
+            for i in range(PRIM_COUNT):
+                author_cube(layer, f"/World/Cube_{i}", 100.0)
+        self._report("sdf_authoring_per_prim", start)
+
+        self.assertEqual(len(stage.GetPrimAtPath("/World").GetChildren()), PRIM_COUNT)
@@ -12,9 +12,31 @@
 #   omni.kit.test - std python's unittest module with additional wrapping to add support for async/await tests
 #   For most things refer to unittest docs: https://docs.python.org/3/library/unittest.html
 # Import extension python module we are testing with absolute import path, as if we are an external user (other extension)
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import carb.settings
+from fastapi import HTTPException
 import {{ python_module }}
-from {{ python_module }}.service import router
+from {{ python_module }} import metrics, service
+from {{ python_module }}.admission import AdmissionController, QueueFullError
+from {{ python_module }}.context_pool import UsdContextPool
+from {{ python_module }}.result_cache import ResultCache, _get_name, get_request_key
+from {{ python_module }}.service import (
+    MEDIA_TYPES,
+    CubeBatchDataModel,
+    CubeDataModel,
+    OutputFormat,
+    generate_cube,
+    generate_cubes,
+    get_metrics,
+    router,
+)
 import omni.kit.test
+import omni.usd
+from pxr import Usd, UsdGeom
 
 
 # Having a test class derived from omni.kit.test.AsyncTestCase declared on the root of the module
@@ -22,11 +44,13 @@ import omni.kit.test
 class Test(omni.kit.test.AsyncTestCaseFailOnLogError):
     # Before running each test
     async def setUp(self):
-        pass
+        # Every request generates its cube, the tests of the result cache set up their own
+        self._result_cache = service._result_cache
+        service._result_cache = None
 
     # After running each test
     async def tearDown(self):
-        pass
+        service._result_cache = self._result_cache
 
     # Test to ensure that the router is properly initialized and not None
     async def test_router_initialization(self):
@@ -37,3 +61,282 @@ class Test(omni.kit.test.AsyncTestCaseFailOnLogError):
         # This step assumes that the route '/generate_cube' should be one of the registered routes
         routes = [route for route in router.routes if route.path == "/generate_cube"]
         self.assertTrue(len(routes) > 0, "The generate_cube endpoint should be registered in the router")
+
+    # Test that a cube is written to the requested location without touching the stage of the USD context
+    async def test_generate_cube(self):
+        context_stage = omni.usd.get_context().get_stage()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await generate_cube(CubeDataModel(asset_write_location=tmp_dir, asset_name="cube", cube_scale=42))
+
+            stage = Usd.Stage.Open(str(Path(tmp_dir).joinpath("cube.usdc")))
+            self.assertEqual(stage.GetDefaultPrim().GetPath(), "/World")
+            cube = UsdGeom.Cube(stage.GetPrimAtPath("/World/Cube"))
+            self.assertTrue(cube, "The generated file should hold a cube")
+            self.assertEqual(cube.GetSizeAttr().Get(), 42)
+
+        self.assertIs(omni.usd.get_context().get_stage(), context_stage)
+
+    # Test that the generated layer has the metrics omni.usd gives a new stage
+    async def test_generate_cube_stage_metrics(self):
+        settings = carb.settings.get_settings()
+        up_axis = settings.get_as_string(service.UP_AXIS_SETTING)
+        settings.set_string(service.UP_AXIS_SETTING, "Z")
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                await generate_cube(CubeDataModel(asset_write_location=tmp_dir, cube_scale=1.0))
+
+                stage = Usd.Stage.Open(str(Path(tmp_dir).joinpath("cube.usdc")))
+                self.assertEqual(UsdGeom.GetStageUpAxis(stage), UsdGeom.Tokens.z)
+                self.assertAlmostEqual(
+                    UsdGeom.GetStageMetersPerUnit(stage),
+                    settings.get_as_float(service.METERS_PER_UNIT_SETTING) or 0.01,
+                )
+        finally:
+            settings.set_string(service.UP_AXIS_SETTING, up_axis)
+
+    # Test that every output format is written with its extension and can be opened
+    async def test_generate_cube_output_formats(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for output_format in OutputFormat:
+                await generate_cube(
+                    CubeDataModel(asset_write_location=tmp_dir, asset_name="cube", output_format=output_format)
+                )
+
+                stage = Usd.Stage.Open(str(Path(tmp_dir).joinpath(f"cube.{output_format.value}")))
+                self.assertTrue(stage.GetPrimAtPath("/World/Cube"), f"The {output_format.value} file holds no cube")
+
+    # Test that the content of the asset is returned instead of written when requested
+    async def test_generate_cube_return_content(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for output_format in OutputFormat:
+                response = await generate_cube(
+                    CubeDataModel(asset_write_location=tmp_dir, output_format=output_format, return_content=True)
+                )
+                self.assertEqual(response.media_type, MEDIA_TYPES[output_format])
+                self.assertFalse(any(Path(tmp_dir).iterdir()), "No file should be written")
+
+                file_path = Path(tmp_dir).joinpath(f"returned.{output_format.value}")
+                file_path.write_bytes(response.body)
+                stage = Usd.Stage.Open(str(file_path))
+                self.assertTrue(stage.GetPrimAtPath("/World/Cube"), f"The {output_format.value} content holds no cube")
+                file_path.unlink()
+
+    async def _generate_cubes(self, batch_data):
+        response = await generate_cubes(batch_data)
+        lines = [line async for line in response.body_iterator]
+        return sorted((json.loads(line) for line in lines), key=lambda result: result["index"])
+
+    # Test that a batch writes one layer per cube and streams a result per cube
+    async def test_generate_cubes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cubes = [
+                CubeDataModel(asset_write_location=tmp_dir, asset_name=f"cube_{i}", cube_scale=i + 1) for i in range(8)
+            ]
+            results = await self._generate_cubes(CubeBatchDataModel(cubes=cubes))
+
+            self.assertEqual([result["index"] for result in results], list(range(8)))
+            for index, result in enumerate(results):
+                stage = Usd.Stage.Open(result["path"])
+                self.assertEqual(UsdGeom.Cube(stage.GetPrimAtPath("/World/Cube")).GetSizeAttr().Get(), index + 1)
+
+    # Test that a batch admits its cubes one by one while streaming, and releases them when the stream is closed early
+    async def test_generate_cubes_admission(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cubes = [
+                CubeDataModel(asset_write_location=tmp_dir, asset_name=f"cube_{i}", cube_scale=1.0) for i in range(4)
+            ]
+            response = await generate_cubes(CubeBatchDataModel(cubes=cubes))
+            self.assertEqual(service._admission.running, 0, "Nothing should be admitted before streaming")
+            lines = [line async for line in response.body_iterator]
+            self.assertEqual(len(lines), 4)
+            self.assertEqual(service._admission.running, 0)
+
+            response = await generate_cubes(CubeBatchDataModel(cubes=cubes))
+            await response.body_iterator.__anext__()
+            await response.body_iterator.aclose()
+            self.assertEqual(service._admission.running, 0)
+            self.assertEqual(service._admission.queued, 0)
+
+    # Test that a batch can write all cubes as prims of a single layer
+    async def test_generate_cubes_single_layer(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cubes = [CubeDataModel(asset_name="cube", cube_scale=i + 1) for i in range(3)]
+            results = await self._generate_cubes(
+                CubeBatchDataModel(cubes=cubes, single_layer=True, asset_write_location=tmp_dir, asset_name="cubes")
+            )
+
+            prim_paths = [result["prim_path"] for result in results]
+            self.assertEqual(prim_paths, ["/World/cube", "/World/cube_1", "/World/cube_2"])
+            stage = Usd.Stage.Open(str(Path(tmp_dir).joinpath("cubes.usdc")))
+            for index, result in enumerate(results):
+                self.assertEqual(result["path"], str(Path(tmp_dir).joinpath("cubes.usdc")))
+                cube = UsdGeom.Cube(stage.GetPrimAtPath(result["prim_path"]))
+                self.assertEqual(cube.GetSizeAttr().Get(), index + 1)
+
+    # Test that requests and their phases are reported in the metrics
+    async def test_metrics(self):
+        metrics.reset()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            await generate_cube(CubeDataModel(asset_write_location=tmp_dir, cube_scale=1.0))
+
+        text = (await get_metrics()).body.decode()
+        self.assertIn('service_requests_total{endpoint="/generate_cube"} 1', text)
+        self.assertIn('service_requests_in_flight{endpoint="/generate_cube"} 0', text)
+        self.assertIn('service_request_duration_seconds_count{endpoint="/generate_cube"} 1', text)
+        for phase in ["stage_creation", "authoring", "export"]:
+            self.assertIn('service_phase_duration_seconds_count{phase="' + phase + '"} 1', text)
+
+    # Test that rejected requests are counted the same way on both endpoints, and that a reset clears the queue gauge
+    async def test_metrics_rejected_requests(self):
+        metrics.reset()
+        admission = service._admission
+        service._admission = AdmissionController(max_concurrency=1, max_queued=0)
+        try:
+            await service._admission.acquire("other")
+            with self.assertRaises(HTTPException):
+                await generate_cube(CubeDataModel())
+            with self.assertRaises(HTTPException):
+                await generate_cubes(CubeBatchDataModel(cubes=[CubeDataModel()]))
+        finally:
+            service._admission = admission
+
+        text = (await get_metrics()).body.decode()
+        for endpoint in ["/generate_cube", "/generate_cubes"]:
+            self.assertIn('service_requests_total{endpoint="' + endpoint + '"} 1', text)
+            self.assertIn('service_requests_rejected_total{endpoint="' + endpoint + '"} 1', text)
+
+        metrics.set_queued_requests(3)
+        metrics.reset()
+        self.assertIn("service_requests_queued 0", (await get_metrics()).body.decode())
+
+    # Test that a repeated request is served from the result cache, wherever the result is delivered
+    async def test_result_cache(self):
+        metrics.reset()
+        cube_scale = 1.0
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as cache_dir:
+            service._result_cache = ResultCache(cache_dir, max_bytes=1024 * 1024)
+            for asset_name in ["first", "second"]:
+                cube_data = CubeDataModel(asset_write_location=tmp_dir, asset_name=asset_name, cube_scale=cube_scale)
+                await generate_cube(cube_data)
+            response = await generate_cube(CubeDataModel(cube_scale=cube_scale, return_content=True))
+
+            first = Path(tmp_dir).joinpath("first.usdc").read_bytes()
+            self.assertEqual(Path(tmp_dir).joinpath("second.usdc").read_bytes(), first)
+            self.assertEqual(response.body, first)
+
+        text = (await get_metrics()).body.decode()
+        self.assertIn('service_result_cache_requests_total{result="miss"} 1', text)
+        self.assertIn('service_result_cache_requests_total{result="hit"} 2', text)
+        self.assertIn('service_phase_duration_seconds_count{phase="export"} 1', text)
+
+    # Test that a cached package is the same as a fresh one, whatever the name of the asset
+    async def test_result_cache_usdz(self):
+        cube_scale = 1.0
+        with tempfile.TemporaryDirectory() as tmp_dir, tempfile.TemporaryDirectory() as cache_dir:
+            service._result_cache = ResultCache(cache_dir, max_bytes=1024 * 1024)
+            fresh = await generate_cube(
+                CubeDataModel(cube_scale=cube_scale, output_format=OutputFormat.USDZ, return_content=True)
+            )
+            for asset_name in ["first", "second"]:
+                await generate_cube(
+                    CubeDataModel(
+                        asset_write_location=tmp_dir,
+                        asset_name=asset_name,
+                        cube_scale=cube_scale,
+                        output_format=OutputFormat.USDZ,
+                    )
+                )
+                self.assertEqual(Path(tmp_dir).joinpath(f"{asset_name}.usdz").read_bytes(), fresh.body)
+
+    # Test that the result cache evicts the least recently used results beyond its size
+    async def test_result_cache_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(tmp_dir, max_bytes=10)
+            keys = [get_request_key({"index": index}, "1.0.0") for index in range(3)]
+            cache.put_bytes(keys[0], "usdc", b"01234")
+            cache.put_bytes(keys[1], "usdc", b"56789")
+            self.assertIsNotNone(cache.get(keys[0], "usdc"))
+            cache.put_bytes(keys[2], "usdc", b"0")
+
+            self.assertIsNotNone(cache.get(keys[0], "usdc"))
+            self.assertIsNone(cache.get(keys[1], "usdc"))
+            self.assertIsNotNone(cache.get(keys[2], "usdc"))
+            self.assertIsNotNone(ResultCache(tmp_dir, max_bytes=10).get(keys[0], "usdc"), "The cache should persist")
+
+    # Test that the result cache leaves alone the files of its directory that are not its own
+    async def test_result_cache_foreign_files(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            foreign = [Path(tmp_dir).joinpath(name) for name in ["scene.usdc", "scene.usdc.1.tmp"]]
+            for path in foreign:
+                path.write_bytes(b"0123456789")
+            cache = ResultCache(tmp_dir, max_bytes=10)
+            cache.put_bytes(get_request_key({"index": 0}, "1.0.0"), "usdc", b"01234")
+            cache.put_bytes(get_request_key({"index": 1}, "1.0.0"), "usdc", b"56789")
+
+            for path in foreign:
+                self.assertTrue(path.exists(), f"{path.name} should be left alone")
+
+    # Test that a failed write leaves neither a result nor a partial file in the result cache
+    async def test_result_cache_failed_write(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(tmp_dir, max_bytes=1024)
+            key = get_request_key({"index": 0}, "1.0.0")
+
+            def write(tmp_path):
+                Path(tmp_path).write_bytes(b"partial")
+                raise OSError("Disk full")
+
+            with self.assertRaises(OSError):
+                cache._store(_get_name(key, "usdc"), write)
+            self.assertIsNone(cache.get(key, "usdc"))
+            self.assertFalse(list(Path(tmp_dir).iterdir()), "The partial file should be removed")
+
+    # Test that queued requests are admitted round robin over clients and that a full queue rejects new requests
+    async def test_admission_control(self):
+        controller = AdmissionController(max_concurrency=1, max_queued=4)
+        order = []
+
+        async def serve(client, index, bounded=True):
+            async with controller.admit(client, bounded):
+                order.append(f"{client}{index}")
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.ensure_future(serve("a", index)) for index in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(serve("b", index)) for index in range(2)]
+        await asyncio.sleep(0)
+
+        self.assertEqual(controller.running, 1)
+        self.assertEqual(controller.queued, 4)
+        with self.assertRaises(QueueFullError) as context:
+            await controller.acquire("c")
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        with self.assertRaises(QueueFullError):
+            controller.check()
+
+        # Requests that are not bounded, like the cubes of an accepted batch, are queued anyway
+        tasks.append(asyncio.ensure_future(serve("c", 0, bounded=False)))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.queued, 5)
+
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ["a0", "a1", "b0", "c0", "a2", "b1"])
+        self.assertEqual(controller.running, 0)
+        self.assertEqual(controller.queued, 0)
+
+    # Test that leased contexts are distinct, hold a new stage while leased and are handed out again once released
+    async def test_usd_context_pool(self):
+        pool = UsdContextPool(2, "test_service_pool")
+        try:
+            async with pool.lease() as first, pool.lease() as second:
+                self.assertNotEqual(first.get_name(), second.get_name())
+                for usd_context in [first, second]:
+                    await usd_context.new_stage_async()
+                    self.assertIsNotNone(usd_context.get_stage())
+
+            self.assertIsNone(first.get_stage(), "The stage should be closed once the lease ends")
+            async with pool.lease() as usd_context:
+                self.assertIn(usd_context.get_name(), pool.names)
+        finally:
+            pool.destroy()
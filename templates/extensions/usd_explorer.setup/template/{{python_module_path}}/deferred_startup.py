@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+from typing import Callable, Optional
+
+import carb
+import omni.kit.app
+
+from .startup_profiler import StartupProfiler
+
+# Frames rendered before the first deferred step runs, so the first frames only carry the critical startup work.
+DEFERRED_STARTUP_DELAY_FRAMES = 2
+
+
+class DeferredStartup:
+    """
+    Runs the startup steps that the first frame does not need.
+
+    The steps run in the order they were added, one per frame, once the first frames are out. A step that is needed
+    earlier, on first use, is run right away with `ensure`. Every step runs at most once.
+    """
+
+    def __init__(self, profiler: StartupProfiler, on_done: Optional[Callable[[], None]] = None):
+        self._profiler = profiler
+        self._on_done = on_done
+        self._pending = {}  # step name -> callable, in the order the steps run
+        self._done = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, name: str, step: Callable[[], None]) -> None:
+        self._pending[name] = step
+
+    def is_done(self, name: str) -> bool:
+        return name in self._done
+
+    def ensure(self, name: str) -> None:
+        """Run step `name` now if it did not run yet."""
+        step = self._pending.pop(name, None)
+        if step:
+            self._run(name, step)
+
+    def start(self) -> None:
+        """Start running the pending steps on the coming frames."""
+        self._task = asyncio.ensure_future(self._run_pending())
+
+    def cancel(self) -> None:
+        """Drop the steps that did not run yet."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+        self._pending.clear()
+
+    def _run(self, name: str, step: Callable[[], None]) -> None:
+        self._done.add(name)
+        with self._profiler.phase(name, deferred=True):
+            try:
+                step()
+            except Exception as exc:  # pragma: no cover
+                carb.log_error(f"Deferred startup step {name} failed: {exc}")
+
+    async def _run_pending(self) -> None:
+        app = omni.kit.app.get_app()
+        for _ in range(DEFERRED_STARTUP_DELAY_FRAMES):
+            await app.next_update_async()
+        while self._pending:
+            name = next(iter(self._pending))
+            self._run(name, self._pending.pop(name))
+            await app.next_update_async()
+        if self._on_done:
+            self._on_done()
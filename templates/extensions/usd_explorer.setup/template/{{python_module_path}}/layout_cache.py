@@ -0,0 +1,62 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import json
+from pathlib import Path
+from typing import Optional
+
+import carb
+import omni.ui as ui
+
+
+def apply_layout(layout: list, keep_windows_open: bool = False) -> None:
+    """Apply a parsed layout to the workspace, like QuickLayout.load_file does with the content of a file."""
+    ui.Workspace.restore_workspace(layout, keep_windows_open)
+
+
+class LayoutCache:
+    """
+    The QuickLayout files of the extension, each read and parsed once.
+
+    A layout is the workspace dump QuickLayout saves as JSON. The cache also keeps the layout of the user, saved when
+    switching to the review mode, in memory instead of in a file.
+    """
+
+    def __init__(self, layouts_path: str):
+        self._layouts_path = Path(layouts_path)
+        self._layouts = {}  # layout file path -> parsed layout
+        self._user_layout: Optional[list] = None
+
+    def get_layout_path(self, name: str) -> str:
+        return str(self._layouts_path / f"{name}.json")
+
+    def get(self, layout_file: str) -> Optional[list]:
+        """The parsed layout of `layout_file`, or None if it cannot be loaded."""
+        layout = self._layouts.get(layout_file)
+        if layout is None:
+            try:
+                layout = json.loads(Path(layout_file).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                carb.log_warn(f"Failed to load layout {layout_file}: {exc}")
+                return None
+            self._layouts[layout_file] = layout
+        return layout
+
+    @property
+    def user_layout(self) -> Optional[list]:
+        return self._user_layout
+
+    def save_user_layout(self) -> None:
+        """Keep the current layout of the workspace as the user layout."""
+        self._user_layout = ui.Workspace.dump_workspace()
+
+    def clear(self) -> None:
+        self._layouts.clear()
+        self._user_layout = None
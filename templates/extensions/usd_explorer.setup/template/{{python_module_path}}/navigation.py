@@ -75,6 +75,7 @@ class Navigation:
         self._settings.set(MEASURE_VISIBLE_PATH, True)
         self._settings.set(SECTION_VISIBLE_PATH, True)
 
+        self._mode = None  # The application mode last switched to
         self._application_mode_changed_sub = self._settings.subscribe_to_node_change_events(
             APPLICATION_MODE_PATH, self._on_application_mode_changed
         )
@@ -121,8 +122,14 @@ class Navigation:
         if not isinstance(self._dict, (carb.dictionary.IDictionary, dict)):
             return
 
-        current_mode = self._dict.get(item)
-        self._test = asyncio.ensure_future(self._switch_by_mode(current_mode))
+        self.apply_mode(self._dict.get(item))
+
+    def apply_mode(self, mode: str) -> None:
+        """Switch the navigation to the application `mode`, unless it is switched to it already."""
+        if mode == self._mode:
+            return
+        self._mode = mode
+        self._test = asyncio.ensure_future(self._switch_by_mode(mode))
 
     async def _switch_by_mode(self, current_mode: str) -> None:
         await omni.kit.app.get_app().next_update_async()
@@ -11,8 +11,6 @@
 import asyncio
 import weakref
 from functools import partial
-import os
-from pathlib import Path
 from typing import cast, Optional
 
 import omni.client
@@ -23,7 +21,6 @@ import omni.kit.context_menu
 import omni.kit.ui
 import omni.usd
 
-from omni.kit.quicklayout import QuickLayout
 from omni.kit.menu.utils import MenuLayout
 from omni.kit.window.title import get_main_window_title
 from omni.kit.usd.layers import LayerUtils
@@ -45,7 +42,17 @@ from pxr import Sdf, Usd
 from .navigation import Navigation
 from .menu_helper import MenuHelper
 from .menubar_helper import MenubarHelper
+from .deferred_startup import DeferredStartup
+from .layout_cache import LayoutCache, apply_layout
 from .stage_template import SunnySkyStage
+from .startup_profiler import StartupProfiler
+from .startup_readiness import (
+    LAYOUT_APPLIED,
+    MAIN_WINDOW_READY,
+    RTX_READY,
+    StartupReadiness,
+    get_startup_readiness,
+)
 from .ui_state_manager import UIStateManager
 
 SETTINGS_PATH_FOCUSED = "/app/workspace/currentFocused"
@@ -57,36 +64,42 @@ ICON_PATH = carb.tokens.get_tokens_interface().resolve("${% raw %}{{% endraw %}{
 SETTINGS_STARTUP_EXPAND_VIEWPORT = "/app/startup/expandViewport"
 VIEWPORT_CONTEXT_MENU_PATH = "/exts/omni.kit.window.viewport/showContextMenu"
 TELEPORT_VISIBLE_PATH = "/persistent/exts/omni.kit.viewport.navigation.teleport/visible"
+STARTUP_REPORT_PATH = "/exts/{{ extension_name }}/startupReportPath"
+HEADLESS_PATH = "/exts/{{ extension_name }}/headless"
 
 
-async def _load_layout_startup(layout_file: str, keep_windows_open: bool=False) -> None:
-    try:
-        # few frames delay to avoid the conflict with the layout of omni.kit.mainwindow
-        for i in range(3):
-            await omni.kit.app.get_app().next_update_async()  # type: ignore
-        QuickLayout.load_file(layout_file, keep_windows_open)
+async def _wait_for(milestone: str) -> None:
+    readiness = get_startup_readiness()
+    if readiness:
+        await readiness.wait(milestone)
+
 
-        # WOR: some layout don't happy collectly the first time
-        await omni.kit.app.get_app().next_update_async()  # type: ignore
-        QuickLayout.load_file(layout_file, keep_windows_open)
-    except Exception as exc: # pragma: no cover (Can't be tested because a non-existing layout file prints an log_error in QuickLayout and does not throw an exception)
-        carb.log_warn(f"Failed to load layout {layout_file}: {exc}")
+async def _load_layout_startup(layout: Optional[list], keep_windows_open: bool=False) -> None:
+    try:
+        await _load_layout(layout, keep_windows_open)
+    finally:
+        # a failed layout must not hold back the tasks waiting for it
+        readiness = get_startup_readiness()
+        if readiness:
+            readiness.reach(LAYOUT_APPLIED)
 
 
-async def _load_layout(layout_file: str, keep_windows_open:bool=False) -> None:
+async def _load_layout(layout: Optional[list], keep_windows_open:bool=False) -> None:
+    if not layout:  # A layout file that failed to load was already reported by the LayoutCache
+        return
     try:
-        # few frames delay to avoid the conflict with the layout of omni.kit.mainwindow
-        for i in range(3):
-            await omni.kit.app.get_app().next_update_async()  # type: ignore
-        QuickLayout.load_file(layout_file, keep_windows_open)
+        # avoid the conflict with the layout of omni.kit.mainwindow
+        await _wait_for(MAIN_WINDOW_READY)
+        apply_layout(layout, keep_windows_open)
 
-    except Exception as exc: # pragma: no cover (Can't be tested because a non-existing layout file prints an log_error in QuickLayout and does not throw an exception)
-        carb.log_warn(f"Failed to load layout {layout_file}: {exc}")
+    except Exception as exc: # pragma: no cover
+        carb.log_warn(f"Failed to apply layout: {exc}")
 
 async def _clear_startup_scene_edits() -> None:
     try:
-        for i in range(50):  # This could possibly be a smaller value. I want to ensure this happens after RTX startup
-            await omni.kit.app.get_app().next_update_async()  # type: ignore
+        # the edits made while RTX starts up are not user edits. A session that never renders clears them once the
+        # wait times out.
+        await _wait_for(RTX_READY)
         omni.usd.get_context().set_pending_edit(False)
     except Exception as exc: # pragma: no cover
         carb.log_warn(f"Failed to clear stage edits on startup: {exc}")
@@ -107,72 +120,119 @@ class SetupExtension(omni.ext.IExt):
 
     def on_startup(self, ext_id: str) -> None:
         self._ext_id = ext_id
-        self._menubar_helper = MenubarHelper()
-        self._menu_helper = MenuHelper()
-
-        # using imgui directly to adjust some color and Variable
-        imgui = _imgui.acquire_imgui()
+        # A headless profile skips the helpers that only build UI
+        self._headless = self._settings.get_as_bool(HEADLESS_PATH)
+        profiler = StartupProfiler(ext_id.split("-")[0])
+        self._readiness = StartupReadiness()
 
-        # match Create overides
-        imgui.push_style_color(_imgui.StyleColor.ScrollbarGrab, carb.Float4(0.4, 0.4, 0.4, 1))
-        imgui.push_style_color(_imgui.StyleColor.ScrollbarGrabHovered, carb.Float4(0.6, 0.6, 0.6, 1))
-        imgui.push_style_color(_imgui.StyleColor.ScrollbarGrabActive, carb.Float4(0.8, 0.8, 0.8, 1))
+        # Built on a later frame, or skipped in a headless profile
+        self._menubar_helper = None
+        self._menu_helper = None
+        self._navigation = None
+        self._current_layout_priority = 0
+        self._layout_menu_items = []
+        self._menu_layout = []
+        self._help_menu_items = []
+
+        if not self._headless:
+            with profiler.phase("imgui_style"):
+                # using imgui directly to adjust some color and Variable
+                imgui = _imgui.acquire_imgui()
+
+                # match Create overides
+                imgui.push_style_color(_imgui.StyleColor.ScrollbarGrab, carb.Float4(0.4, 0.4, 0.4, 1))
+                imgui.push_style_color(_imgui.StyleColor.ScrollbarGrabHovered, carb.Float4(0.6, 0.6, 0.6, 1))
+                imgui.push_style_color(_imgui.StyleColor.ScrollbarGrabActive, carb.Float4(0.8, 0.8, 0.8, 1))
+
+                # DockSplitterSize is the variable that drive the size of the Dock Split connection
+                imgui.push_style_var_float(_imgui.StyleVar.DockSplitterSize, 2)
+
+        with profiler.phase("layout"):
+            # setup the Layout for your app
+            self._layouts_path = carb.tokens.get_tokens_interface().resolve("${% raw %}{{% endraw %}{{ extension_name }}{% raw %}}{% endraw %}/layouts")
+            # the user layout is only kept in memory, so we always load the default layout when startup
+            self._layout_cache = LayoutCache(self._layouts_path)
+            layout_file = self._layout_cache.get_layout_path(self._settings.get('/app/layout/name'))
+            if not self._headless:
+                self.__setup_window_task = asyncio.ensure_future(
+                    _load_layout_startup(self._layout_cache.get(layout_file), True)
+                )
+            else:
+                self._readiness.reach(LAYOUT_APPLIED)
 
-        # DockSplitterSize is the variable that drive the size of the Dock Split connection
-        imgui.push_style_var_float(_imgui.StyleVar.DockSplitterSize, 2)
+            self.review_layout_path = self._layout_cache.get_layout_path("comment_layout")
+            self.default_layout_path = self._layout_cache.get_layout_path("default")
 
-        # setup the Layout for your app
-        self._layouts_path = carb.tokens.get_tokens_interface().resolve("${% raw %}{{% endraw %}{{ extension_name }}{% raw %}}{% endraw %}/layouts")
-        layout_file = Path(self._layouts_path).joinpath(f"{self._settings.get('/app/layout/name')}.json")
-        self.__setup_window_task = asyncio.ensure_future(_load_layout_startup(f"{layout_file}", True))
+        if not self._headless:
+            with profiler.phase("window_title"):
+                # setup the Application Title
+                window_title = get_main_window_title()
+                if window_title:
+                    window_title.set_app_version("{{ version }}")
 
-        self.review_layout_path = str(Path(self._layouts_path) / "comment_layout.json")
-        self.default_layout_path = str(Path(self._layouts_path) / "default.json")
-        self.layout_user_path = str(Path(self._layouts_path) / "layout_user.json")
+        with profiler.phase("mode_subscription"):
+            self._application_mode_changed_sub = self._settings.subscribe_to_node_change_events(
+                APPLICATION_MODE_PATH, weakref.proxy(self)._on_application_mode_changed
+            )
 
-        # remove the user defined layout so that we always load the default layout when startup
-        if os.path.exists(self.layout_user_path):
-            os.remove(self.layout_user_path)
+        with profiler.phase("viewport_menubar"):
+            self._set_viewport_menubar_visibility(False)
+        self._test = asyncio.ensure_future(_clear_startup_scene_edits())
 
-        # setup the menu and their layout
-        self._current_layout_priority = 0
-        self._layout_menu_items = []
-        self._layout_file_menu()
-        self._menu_layout = []
-        if self._settings.get_as_bool('/app/view/debug/menus'):
-            self._layout_menu()
+        with profiler.phase("stage_subscription"):
+            self._usd_context = omni.usd.get_context()
+            self._stage_event_sub = self._usd_context.get_stage_event_stream().create_subscription_to_pop(
+                self._on_stage_open_event, name="TeleportDefaultOn"
+            )
+        with profiler.phase("viewport_fill"):
+            if self._settings.get_as_bool(SETTINGS_STARTUP_EXPAND_VIEWPORT):
+                self._set_viewport_fill_on()
 
+        with profiler.phase("stage_templates"):
+            self._stage_templates = [SunnySkyStage()]
 
-        # setup the Application Title
-        window_title = get_main_window_title()
-        if window_title:
-            window_title.set_app_version("{{ version }}")
+        with profiler.phase("viewport_selection"):
+            disable_selection(get_active_viewport())
 
-        # self._context_menu()
-        self._register_my_menu()
+        with profiler.phase("ui_state_manager"):
+            self._ui_state_manager = UIStateManager()
+            self._setup_ui_state_changes()
+
+        report_path = self._settings.get_as_string(STARTUP_REPORT_PATH)
+        report_path = carb.tokens.get_tokens_interface().resolve(report_path) if report_path else ""
+
+        # Everything the first frame does not need runs on the following frames, or on first use. The report is written
+        # once they all ran.
+        profiler.stop()
+        self._deferred_startup = DeferredStartup(profiler, on_done=partial(profiler.finish, report_path))
+        if not self._headless:
+            self._deferred_startup.add("navigation", self._create_navigation)
+            self._deferred_startup.add("menubar_helper", self._create_menubar_helper)
+            self._deferred_startup.add("menu_helper", self._create_menu_helper)
+            self._deferred_startup.add("menu_layouts", self._create_menu_layouts)
+            # self._context_menu()
+            self._deferred_startup.add("context_menu", self._register_my_menu)
+            self._deferred_startup.add("window_menus", self._create_window_menus)
+
+        self._deferred_startup.start()
+
+    def _create_navigation(self) -> None:
         self._navigation = Navigation()
-        self._navigation.on_startup(ext_id)
-
-        self._application_mode_changed_sub = self._settings.subscribe_to_node_change_events(
-            APPLICATION_MODE_PATH, weakref.proxy(self)._on_application_mode_changed
-        )
-
-        self._set_viewport_menubar_visibility(False)
-        self._test = asyncio.ensure_future(_clear_startup_scene_edits())
+        self._navigation.on_startup(self._ext_id)
 
-        self._usd_context = omni.usd.get_context()
-        self._stage_event_sub = self._usd_context.get_stage_event_stream().create_subscription_to_pop(
-            self._on_stage_open_event, name="TeleportDefaultOn"
-        )
-        if self._settings.get_as_bool(SETTINGS_STARTUP_EXPAND_VIEWPORT):
-            self._set_viewport_fill_on()
+    def _create_menubar_helper(self) -> None:
+        self._menubar_helper = MenubarHelper()
 
-        self._stage_templates = [SunnySkyStage()]
+    def _create_menu_helper(self) -> None:
+        self._menu_helper = MenuHelper()
 
-        disable_selection(get_active_viewport())
+    def _create_menu_layouts(self) -> None:
+        # setup the menu and their layout
+        self._layout_file_menu()
+        if self._settings.get_as_bool('/app/view/debug/menus'):
+            self._layout_menu()
 
-        self._ui_state_manager = UIStateManager()
-        self._setup_ui_state_changes()
+    def _create_window_menus(self) -> None:
         omni.kit.menu.utils.add_layout([
             MenuLayout.Menu("Window", [
                 MenuLayout.Item("Viewport", source="Window/Viewport/Viewport 1"),
@@ -193,6 +253,9 @@ class SetupExtension(omni.ext.IExt):
 
     def _on_stage_open_event(self, event: carb.events.IEvent) -> None:
         if event.type == int(omni.usd.StageEventType.OPENED):
+            # The navigation sets its tools up when created, which must not override the tools set here
+            self._deferred_startup.ensure("navigation")
+
             app_mode = self._settings.get_as_string(APPLICATION_MODE_PATH).lower()
 
             # exit all tools
@@ -226,6 +289,13 @@ class SetupExtension(omni.ext.IExt):
         ViewportMenuModel()._item_changed(None)  # type: ignore
 
     def _on_application_mode_changed(self, item: carb.dictionary.Item, _typ: carb.settings.ChangeEventType) -> None:
+        if not self._deferred_startup.is_done("navigation"):
+            # First use of the navigation, subscribed too late to be sure to get this change. A mode is switched to
+            # once, whether or not its own subscription gets the change as well.
+            self._deferred_startup.ensure("navigation")
+            if self._navigation:
+                self._navigation.apply_mode(self._settings.get_as_string(APPLICATION_MODE_PATH))
+
         if self._settings.get_as_string(APPLICATION_MODE_PATH).lower() == "review":
             omni.usd.get_context().get_selection().clear_selected_prim_paths()
             disable_selection(get_active_viewport())
@@ -244,13 +314,13 @@ class SetupExtension(omni.ext.IExt):
 
         if current_mode == "review":
             # save the current layout for restoring later if switch back
-            QuickLayout.save_file(self.layout_user_path)
+            self._layout_cache.save_user_layout()
             # we don't want to keep any windows except the ones which are visible in self.review_layout_path
-            await _load_layout(self.review_layout_path, False)
+            await _load_layout(self._layout_cache.get(self.review_layout_path), False)
         else:  # current_mode == "layout":
             # check if there is any user modified layout, if yes use that one
-            layout_filename = self.layout_user_path if os.path.exists(self.layout_user_path) else self.default_layout_path
-            await _load_layout(layout_filename, keep_windows)
+            layout = self._layout_cache.user_layout or self._layout_cache.get(self.default_layout_path)
+            await _load_layout(layout, keep_windows)
 
         self._set_viewport_menubar_visibility(current_mode == "layout")
 
@@ -282,8 +352,6 @@ class SetupExtension(omni.ext.IExt):
 
             editor_menu = omni.kit.ui.get_editor_menu()
 
-            layouts_path = carb.tokens.get_tokens_interface().resolve("${% raw %}{{% endraw %}{{ extension_name }}{% raw %}}{% endraw %}/layouts")
-
             menu_path = f"Layout/{name}"
             menu = editor_menu.add_item(menu_path, None, False, self._current_layout_priority)  # type: ignore
             self._current_layout_priority = self._current_layout_priority + 1
@@ -298,7 +366,9 @@ class SetupExtension(omni.ext.IExt):
             else:
                 menu_action = omni.kit.menu.utils.add_action_to_menu(
                     menu_path,
-                    lambda *_: asyncio.ensure_future(_load_layout(f"{layouts_path}/{parameter}.json")),
+                    lambda *_: asyncio.ensure_future(
+                        _load_layout(self._layout_cache.get(self._layout_cache.get_layout_path(parameter)))
+                    ),
                     name,
                     (carb.input.KEYBOARD_MODIFIER_FLAG_CONTROL, key),
                 )
@@ -495,19 +565,26 @@ class SetupExtension(omni.ext.IExt):
         self._custom_quicklayout_menu()
 
     def on_shutdown(self):
+        self._deferred_startup.cancel()
+        self._readiness.destroy()
+        self._readiness = None
+        self._layout_cache.clear()
         if self._menu_layout:
             omni.kit.menu.utils.remove_layout(self._menu_layout)  # type: ignore
             self._menu_layout.clear()
         self._layout_menu_items.clear()
-        self._navigation.on_shutdown()
-        del self._navigation
+        if self._navigation:
+            self._navigation.on_shutdown()
+            self._navigation = None
         self._settings.unsubscribe_to_change_events(self._application_mode_changed_sub)
         del self._application_mode_changed_sub
 
         self._stage_event_sub = None
 
         # From View setup
-        self._menubar_helper.destroy()
+        if self._menubar_helper:
+            self._menubar_helper.destroy()
+            self._menubar_helper = None
         if self._menu_helper and hasattr(self._menu_helper, "destroy"):
             self._menu_helper.destroy()
         self._menu_helper = None
@@ -0,0 +1,84 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import carb
+import carb.profiler
+
+PROFILER_MASK = 1
+
+_last_report: Optional[dict] = None
+
+
+def get_startup_report() -> Optional[dict]:
+    """The report of the last profiled startup, or None if no startup was profiled yet."""
+    return _last_report
+
+
+class StartupProfiler:
+    """
+    Times the phases of an extension startup.
+
+    Every phase is a carb profiler zone named `<name>.<phase>`, so it shows in the Kit profiler next to the zones of
+    Kit itself. The durations are also collected into a report, see `finish`. Phases deferred to later frames, after
+    `stop`, are reported apart from the ones blocking the startup.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._start = time.perf_counter()
+        self._total_ms = None
+        self._phases = {}  # phase -> duration in milliseconds, in the order the phases ran
+        self._deferred_phases = {}  # deferred phase -> duration in milliseconds
+
+    @contextmanager
+    def phase(self, phase: str, deferred: bool = False):
+        """Time the block as `phase`. A phase entered several times adds up."""
+        carb.profiler.begin(PROFILER_MASK, f"{self._name}.{phase}")
+        phases = self._deferred_phases if deferred else self._phases
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases[phase] = phases.get(phase, 0.0) + (time.perf_counter() - start) * 1000.0
+            carb.profiler.end(PROFILER_MASK)
+
+    def stop(self) -> None:
+        """End the blocking startup. Its duration is the total of the report."""
+        if self._total_ms is None:
+            self._total_ms = (time.perf_counter() - self._start) * 1000.0
+
+    def finish(self, report_path: str = "") -> dict:
+        """
+        Complete the report and make it the one returned by `get_startup_report`. It is also written as JSON to
+        `report_path` when given. Call it once, when the deferred phases ran too.
+        """
+        global _last_report
+        self.stop()
+        report = {
+            "extension": self._name,
+            "total_ms": self._total_ms,
+            "phases_ms": dict(self._phases),
+            "deferred_phases_ms": dict(self._deferred_phases),
+        }
+        _last_report = report
+
+        if report_path:
+            try:
+                Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+                Path(report_path).write_text(json.dumps(report, indent=4))
+            except OSError as exc:
+                carb.log_warn(f"Failed to write startup report {report_path}: {exc}")
+        return report
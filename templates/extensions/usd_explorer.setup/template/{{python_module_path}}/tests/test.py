@@ -8,6 +8,8 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 
+import asyncio
+
 import omni.kit.app
 
 from omni.ui.tests.test_base import OmniUiTest
@@ -198,6 +200,58 @@ class TestSetupToolExtension(OmniUiTest):
         import omni.usd
         self.assertFalse(omni.usd.get_context().has_pending_edit())
 
+    async def test_startup_readiness(self):
+        from ..startup_readiness import LAYOUT_APPLIED, MAIN_WINDOW_READY, get_startup_readiness
+
+        readiness = get_startup_readiness()
+        await readiness.wait(MAIN_WINDOW_READY)
+        await readiness.wait(LAYOUT_APPLIED)
+        self.assertTrue(readiness.is_reached(MAIN_WINDOW_READY))
+        self.assertTrue(readiness.is_reached(LAYOUT_APPLIED))
+
+        waiter = asyncio.ensure_future(readiness.wait("test_milestone"))
+        await omni.kit.app.get_app().next_update_async()
+        self.assertFalse(waiter.done())
+        readiness.reach("test_milestone")
+        await waiter
+        self.assertTrue(readiness.is_reached("test_milestone"))
+
+        # A milestone that is never reached does not block its waiters past the timeout
+        self.assertFalse(await readiness.wait("unreached_milestone", timeout=0.01))
+
+    async def test_layout_cache(self):
+        import os
+        import carb.tokens
+        from ..layout_cache import LayoutCache
+
+        layouts_path = carb.tokens.get_tokens_interface().resolve("${" + ext_id + "}/layouts")
+        layout_cache = LayoutCache(layouts_path)
+        default_layout_path = layout_cache.get_layout_path("default")
+
+        layout = layout_cache.get(default_layout_path)
+        self.assertTrue(layout)
+        self.assertIs(layout_cache.get(default_layout_path), layout)
+        self.assertIsNone(layout_cache.get(layout_cache.get_layout_path("missing_layout")))
+
+        self.assertIsNone(layout_cache.user_layout)
+        layout_cache.save_user_layout()
+        self.assertTrue(layout_cache.user_layout)
+        self.assertFalse(os.path.exists(os.path.join(layouts_path, "layout_user.json")))
+
+        layout_cache.clear()
+        self.assertIsNone(layout_cache.user_layout)
+
     async def test_stage_template(self):
         import omni.kit.stage_templates
         omni.kit.stage_templates.new_stage(template='SunnySky')
+
+        import omni.usd
+        from pxr import UsdGeom
+        stage = omni.usd.get_context().get_stage()
+        self.assertEqual(stage.GetPrimAtPath("/Environment").GetTypeName(), "Xform")
+        for path, type_name in [("/Environment/Sky", "DomeLight"), ("/Environment/DistantLight", "DistantLight")]:
+            prim = stage.GetPrimAtPath(path)
+            self.assertEqual(prim.GetTypeName(), type_name)
+            xformable = UsdGeom.Xformable(prim)
+            self.assertEqual([op.GetOpName() for op in xformable.GetOrderedXformOps()],
+                             ["xformOp:translate", "xformOp:rotateXYZ", "xformOp:scale"])
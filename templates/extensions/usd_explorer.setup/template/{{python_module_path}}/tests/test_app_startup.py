@@ -16,6 +16,32 @@ import carb.settings
 import omni.kit.app
 from omni.kit.test import AsyncTestCase
 
+from ..startup_profiler import get_startup_report
+
+# Budget in milliseconds of each phase of the setup extension startup, and of the whole startup
+STARTUP_PHASE_BUDGETS_MS = {
+    "imgui_style": 20,
+    "layout": 50,
+    "window_title": 20,
+    "mode_subscription": 10,
+    "viewport_menubar": 20,
+    "stage_subscription": 10,
+    "viewport_fill": 50,
+    "stage_templates": 20,
+    "viewport_selection": 30,
+    "ui_state_manager": 50,
+}
+STARTUP_BUDGET_MS = 400
+# Budget in milliseconds of each phase deferred to the frames after the startup
+DEFERRED_STARTUP_PHASE_BUDGETS_MS = {
+    "navigation": 200,
+    "menubar_helper": 100,
+    "menu_helper": 100,
+    "menu_layouts": 200,
+    "context_menu": 50,
+    "window_menus": 200,
+}
+
 
 class TestAppStartup(AsyncTestCase):
     def app_startup_time(self, test_id: str) -> float:
@@ -86,6 +112,41 @@ class TestAppStartup(AsyncTestCase):
         self.app_startup_time(self.id())
         self.assertTrue(True)
 
+    def setup_startup_phases(self, test_id: str) -> dict:
+        """Get the duration of the phases of the setup extension startup - send to nvdf"""
+        test_start_time = time.monotonic()
+        report = get_startup_report()
+        test_result = {f"startup_{phase}_ms": duration for phase, duration in report["phases_ms"].items()}
+        test_result["startup_setup_ms"] = report["total_ms"]
+        test_result.update(
+            {f"startup_deferred_{phase}_ms": duration for phase, duration in report["deferred_phases_ms"].items()}
+        )
+        for phase, duration in report["phases_ms"].items():
+            print(f"Setup startup phase {phase}: {duration:.2f} ms")
+        for phase, duration in report["deferred_phases_ms"].items():
+            print(f"Setup deferred startup phase {phase}: {duration:.2f} ms")
+        self._post_to_nvdf(test_id, test_result, time.monotonic() - test_start_time)
+        return report
+
+    async def test_l1_app_startup_phases(self):
+        """Check the phases of the setup extension startup against their budgets - send to nvdf"""
+        # Let the deferred phases run
+        for _ in range(60):
+            await omni.kit.app.get_app().next_update_async()
+
+        report = self.setup_startup_phases(self.id())
+
+        self.assertEqual(set(report["phases_ms"]), set(STARTUP_PHASE_BUDGETS_MS))
+        for phase, duration in report["phases_ms"].items():
+            self.assertLessEqual(duration, STARTUP_PHASE_BUDGETS_MS[phase], f"Startup phase {phase} is over budget")
+        self.assertLessEqual(report["total_ms"], STARTUP_BUDGET_MS, "Setup startup is over budget")
+
+        self.assertEqual(set(report["deferred_phases_ms"]), set(DEFERRED_STARTUP_PHASE_BUDGETS_MS))
+        for phase, duration in report["deferred_phases_ms"].items():
+            self.assertLessEqual(
+                duration, DEFERRED_STARTUP_PHASE_BUDGETS_MS[phase], f"Deferred startup phase {phase} is over budget"
+            )
+
     async def test_l1_app_startup_warning_count(self):
         """Get the count of warnings during startup - send to nvdf"""
         for _ in range(60):
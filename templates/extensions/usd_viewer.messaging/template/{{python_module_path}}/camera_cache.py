@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+from collections import OrderedDict
+
+from pxr import Sdf
+
+# Name of the snapshot taken when a stage is opened. It is what `resetStage` restores by default.
+DEFAULT_BOOKMARK = "default"
+
+# Camera attributes describing the lens. Together with the `xformOp` attributes they define what the camera sees.
+LENS_ATTRIBUTES = (
+    "projection",
+    "focalLength",
+    "focusDistance",
+    "fStop",
+    "horizontalAperture",
+    "horizontalApertureOffset",
+    "verticalAperture",
+    "verticalApertureOffset",
+    "clippingRange",
+)
+
+
+class CameraStateCache:
+    """
+    Named snapshots of a camera's transform and lens, kept per stage URL.
+
+    Both the stages and the snapshots of a stage are evicted least recently used first. The default snapshot of a
+    stage is only evicted together with the stage, and the snapshot being captured is never evicted.
+    """
+
+    def __init__(self, max_stages: int = 8, max_bookmarks: int = 16):
+        self._max_stages = max(1, max_stages)
+        self._max_bookmarks = max(1, max_bookmarks)
+        self._stages: OrderedDict = OrderedDict()  # stage url -> OrderedDict of bookmark name -> snapshot
+
+    def capture(self, stage_url: str, camera_prim, name: str = DEFAULT_BOOKMARK) -> None:
+        """
+        Store the transform and lens attributes of `camera_prim` as snapshot `name` of `stage_url`.
+        """
+        snapshot = {}
+        for attr in camera_prim.GetAttributes():
+            attr_name = attr.GetName()
+            if attr_name in LENS_ATTRIBUTES or attr_name == "xformOpOrder" or attr_name.startswith("xformOp:"):
+                value = attr.Get()
+                if value is not None:
+                    snapshot[attr_name] = (attr.GetTypeName(), value)
+
+        bookmarks = self._stages.pop(stage_url, None) or OrderedDict()
+        self._stages[stage_url] = bookmarks
+        while len(self._stages) > self._max_stages:
+            self._stages.popitem(last=False)
+
+        bookmarks.pop(name, None)
+        bookmarks[name] = snapshot
+        # The snapshot just stored is never evicted, even when the default one alone fills the limit
+        evictable = [bookmark for bookmark in bookmarks if bookmark not in (DEFAULT_BOOKMARK, name)]
+        while len(bookmarks) > self._max_bookmarks and evictable:
+            del bookmarks[evictable.pop(0)]
+
+    def has(self, stage_url: str, name: str = DEFAULT_BOOKMARK) -> bool:
+        return name in self._stages.get(stage_url, {})
+
+    def names(self, stage_url: str) -> list:
+        return list(self._stages.get(stage_url, {}))
+
+    def restore(self, stage_url: str, camera_prim, layer, name: str = DEFAULT_BOOKMARK) -> int:
+        """
+        Author the attributes of snapshot `name` that differ from the current values of `camera_prim` on `layer`.
+
+        All values are authored in a single `Sdf.ChangeBlock`, so the restore costs one recomposition.
+        Returns the number of attributes that were authored. Raises a `KeyError` for an unknown snapshot.
+        """
+        bookmarks = self._stages[stage_url]
+        snapshot = bookmarks[name]
+        self._stages.move_to_end(stage_url)
+        bookmarks.move_to_end(name)
+
+        changed = {}
+        for attr_name, (type_name, value) in snapshot.items():
+            attr = camera_prim.GetAttribute(attr_name)
+            if not attr or attr.Get() != value:
+                changed[attr_name] = (type_name, value)
+        if not changed:
+            return 0
+
+        prim_path = camera_prim.GetPath()
+        with Sdf.ChangeBlock():
+            prim_spec = Sdf.CreatePrimInLayer(layer, prim_path)
+            for attr_name, (type_name, value) in changed.items():
+                attr_spec = layer.GetAttributeAtPath(prim_path.AppendProperty(attr_name))
+                if not attr_spec:
+                    attr_spec = Sdf.AttributeSpec(prim_spec, attr_name, type_name)
+                attr_spec.default = value
+        return len(changed)
+
+    def clear(self) -> None:
+        self._stages.clear()
@@ -8,6 +8,7 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 import omni.ext
+from .message_queue import MessageQueue
 from .stage_loading import LoadingManager
 from .stage_management import StageManager
 
@@ -18,8 +19,9 @@ class Extension(omni.ext.IExt):
 
     def on_startup(self):
         # Internal messaging state
-        self._loading_manager: LoadingManager = LoadingManager()
-        self._stage_manager: StageManager = StageManager()
+        self._message_queue: MessageQueue = MessageQueue()
+        self._loading_manager: LoadingManager = LoadingManager(self._message_queue)
+        self._stage_manager: StageManager = StageManager(self._message_queue)
 
     def on_shutdown(self):
         # Resetting the state.
@@ -29,3 +31,6 @@ class Extension(omni.ext.IExt):
         if self._stage_manager:
             self._stage_manager.on_shutdown()
             self._stage_manager = None
+        if self._message_queue:
+            self._message_queue.on_shutdown()
+            self._message_queue = None
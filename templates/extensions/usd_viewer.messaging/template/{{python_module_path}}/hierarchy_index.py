@@ -0,0 +1,258 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import fnmatch
+import re
+
+import carb
+from pxr import Sdf, Tf, Usd
+
+
+class HierarchyIndex:
+    """
+    In-memory index of the prim hierarchy of a stage.
+
+    The index is built with a single traversal of the stage and kept current from `Usd.Notice.ObjectsChanged`.
+    Besides the parent/child relations it maps prim names and filter names to prim paths, which lets the stage be
+    searched without traversing it.
+    Resynced paths are only recorded when the notice arrives and re-read from the stage on the next query, so a burst
+    of edits costs one refresh per affected subtree.
+    """
+
+    def __init__(self, filter_types: dict):
+        """
+        Args:
+            filter_types (dict): Filter names mapped to the schema type a prim has to be (`IsA`) to pass the filter.
+        """
+        self._filter_types = filter_types
+        self._stage = None
+        self._listener = None
+        self._children: dict = {}  # prim path -> ordered list of child prim paths
+        self._filter_keys: dict = {}  # prim path -> frozenset of the filter names the prim passes
+        self._filtered: dict = {}  # (prim path, filters) -> ordered list of child prim paths passing the filters
+        self._by_name: dict = {}  # lower case prim name -> prim paths (as dict keys to keep insertion order)
+        self._by_filter: dict = {}  # filter name -> prim paths passing the filter (as dict keys)
+        self._dirty: set = set()  # resynced prim paths not yet re-read from the stage
+
+    @property
+    def stage(self):
+        return self._stage
+
+    def build(self, stage) -> None:
+        """
+        Index the complete prim hierarchy of `stage` and start listening for changes to it.
+        """
+        self.clear()
+        if not stage:
+            return
+        self._stage = stage
+        self._add_subtree(stage.GetPseudoRoot())
+        self._listener = Tf.Notice.Register(Usd.Notice.ObjectsChanged, self._on_objects_changed, stage)
+        carb.log_info(f"Indexed {len(self._children)} prims of stage {stage.GetRootLayer().identifier}")
+
+    def clear(self) -> None:
+        """
+        Drop the indexed data and stop listening for changes.
+        """
+        if self._listener:
+            self._listener.Revoke()
+            self._listener = None
+        self._stage = None
+        self._children.clear()
+        self._filter_keys.clear()
+        self._filtered.clear()
+        self._by_name.clear()
+        self._by_filter.clear()
+        self._dirty.clear()
+
+    def __contains__(self, prim_path: str) -> bool:
+        self._flush()
+        return prim_path in self._children
+
+    def has_children(self, prim_path: str) -> bool:
+        self._flush()
+        return bool(self._children.get(prim_path))
+
+    def get_children(self, prim_path: str, filters=None, exclude=None) -> list:
+        """
+        Ordered paths of the children of `prim_path`.
+
+        Args:
+            prim_path (str): Path of the parent prim.
+            filters (list): When given, only children passing any of these filters are returned.
+            exclude (callable): Optional predicate on a child's name. Children it returns True for are left out. It has
+                to give the same answer for every call with a given `prim_path`.
+
+        The result is cached until the indexed hierarchy changes, so paging through the children of a prim only pays
+        for the filtering once. The returned list must not be modified.
+        """
+        self._flush()
+        key = (prim_path, tuple(filters) if filters is not None else None)
+        children = self._filtered.get(key)
+        if children is None:
+            children = []
+            for child_path in self._children.get(prim_path, []):
+                if filters is not None and not any(filt in self._filter_keys[child_path] for filt in filters):
+                    continue
+                if exclude and exclude(child_path.rsplit('/', 1)[-1]):
+                    continue
+                children.append(child_path)
+            self._filtered[key] = children
+        return children
+
+    def search(self, pattern: str, filters=None, limit: int = 0, exclude=None) -> tuple:
+        """
+        Paths of the prims whose name matches `pattern`, in no particular order.
+
+        Args:
+            pattern (str): Case insensitive name substring, or a glob when it contains any of `*?[`. An empty pattern
+                matches every prim.
+            filters (list): When given, only prims passing any of these filters are returned.
+            limit (int): Maximum number of paths to return, `0` for no limit.
+            exclude (callable): Optional predicate on a prim path. Prims it returns True for are left out.
+
+        Returns:
+            tuple: The matching paths and whether more prims than `limit` matched.
+
+        Only the distinct prim names are matched against `pattern`, so the cost depends on the number of names rather
+        than on the number of prims.
+        """
+        self._flush()
+        pattern = pattern.lower()
+        if not pattern:
+            match = None
+        elif any(c in pattern for c in "*?["):
+            match = re.compile(fnmatch.translate(pattern)).match
+        else:
+            match = lambda name: pattern in name
+
+        if filters is not None and match is None:
+            # Type only searches are answered from the filter buckets.
+            buckets = [self._by_filter.get(filt, {}) for filt in filters]
+        else:
+            buckets = (paths for name, paths in self._by_name.items() if match is None or match(name))
+
+        results = []
+        seen = set()
+        for paths in buckets:
+            for path in paths:
+                if path in seen:
+                    continue
+                if filters is not None and not any(filt in self._filter_keys[path] for filt in filters):
+                    continue
+                if exclude and exclude(path):
+                    continue
+                if limit and len(results) == limit:
+                    return results, True
+                seen.add(path)
+                results.append(path)
+        return results, False
+
+    def match(self, pattern: str) -> list:
+        """
+        Paths of the indexed prims matching the path glob `pattern`, parents before their descendants.
+
+        `*` also matches across `/`, so `/World/Factory/*` matches every descendant of `/World/Factory`. A pattern
+        without wildcards matches the prim at that path only.
+        """
+        self._flush()
+        wildcards = [pattern.index(c) for c in "*?[" if c in pattern]
+        if not wildcards:
+            return [pattern] if pattern in self._children else []
+
+        # Only the subtree of the deepest wildcard free ancestor can match.
+        root = pattern[:min(wildcards)].rsplit('/', 1)[0] or '/'
+        match = re.compile(fnmatch.translate(pattern)).match
+        return [path for path in self._iter_subtree(root) if match(path)]
+
+    def _iter_subtree(self, root: str):
+        """
+        Depth first iteration over `root` and its indexed descendants.
+        """
+        pending = [root] if root in self._children else []
+        while pending:
+            path = pending.pop()
+            yield path
+            pending.extend(reversed(self._children[path]))
+
+    def _add_subtree(self, root) -> None:
+        """
+        Index `root` and all of its descendants.
+        """
+        for prim in Usd.PrimRange(root):
+            path = str(prim.GetPath())
+            self._children[path] = [str(child_path) for child_path in self._child_paths(prim)]
+            filter_keys = frozenset(name for name, schema in self._filter_types.items() if prim.IsA(schema))
+            self._filter_keys[path] = filter_keys
+            for filt in filter_keys:
+                self._by_filter.setdefault(filt, {})[path] = None
+            if not prim.IsPseudoRoot():
+                self._by_name.setdefault(prim.GetName().lower(), {})[path] = None
+
+    @staticmethod
+    def _child_paths(prim) -> list:
+        prim_path = prim.GetPath()
+        return [prim_path.AppendChild(name) for name in prim.GetChildrenNames()]
+
+    def _remove_subtree(self, prim_path: str) -> None:
+        """
+        Drop `prim_path` and all of its indexed descendants.
+        """
+        pending = [prim_path]
+        while pending:
+            path = pending.pop()
+            pending.extend(self._children.pop(path, []))
+            for filt in self._filter_keys.pop(path, ()):
+                self._by_filter[filt].pop(path, None)
+            name = path.rsplit('/', 1)[-1].lower()
+            paths = self._by_name.get(name)
+            if paths is not None:
+                paths.pop(path, None)
+                if not paths:
+                    del self._by_name[name]
+
+    def _on_objects_changed(self, notice, stage) -> None:
+        """
+        Record the prims whose hierarchy changed. Property and info-only changes do not affect the index.
+        """
+        for path in notice.GetResyncedPaths():
+            if path.IsAbsoluteRootOrPrimPath():
+                self._dirty.add(str(path))
+
+    def _flush(self) -> None:
+        """
+        Re-read the resynced subtrees from the stage.
+        """
+        if not self._dirty or not self._stage:
+            return
+        dirty = self._dirty
+        self._dirty = set()
+        # Filtered child lists are cheap to rebuild from the index, so drop them all rather than tracking owners.
+        self._filtered.clear()
+
+        # Refreshing a prim also refreshes its descendants, so only the top-most resynced paths are processed.
+        refreshed = []
+        for sdf_path in sorted((Sdf.Path(path) for path in dirty), key=lambda p: p.pathElementCount):
+            if any(sdf_path.HasPrefix(root) for root in refreshed):
+                continue
+            refreshed.append(sdf_path)
+
+            path = str(sdf_path)
+            self._remove_subtree(path)
+            prim = self._stage.GetPrimAtPath(sdf_path)
+            if prim:
+                self._add_subtree(prim)
+
+            # The parent gains or loses a child when a prim is added, removed or deactivated.
+            if sdf_path != Sdf.Path.absoluteRootPath:
+                parent_path = sdf_path.GetParentPath()
+                parent = self._stage.GetPrimAtPath(parent_path)
+                if parent and str(parent_path) in self._children:
+                    self._children[str(parent_path)] = [str(child_path) for child_path in self._child_paths(parent)]
@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import time
+
+import carb
+import carb.events
+import carb.settings
+import omni.kit.app
+
+FLUSH_INTERVAL_SETTING = "/exts/{{ extension_name }}/outgoingFlushInterval"
+
+
+class MessageQueue:
+    """
+    Queue of outgoing messages to the streaming client.
+
+    Messages are collected during a frame and dispatched on the next update tick, followed by a single pump of the
+    message bus. Messages sent with `coalesce=True` replace any queued message of the same type, so a burst of status
+    events only sends the latest one.
+
+    The `outgoingFlushInterval` setting gives the minimum number of seconds between two flushes. `0` flushes on every
+    update tick.
+    """
+
+    def __init__(self):
+        self._pending: dict = {}  # key -> (event type, payload), in the order messages were first queued
+        self._counter: int = 0
+        self._last_flush: float = 0.0
+        self._flush_interval: float = carb.settings.get_settings().get_as_float(FLUSH_INTERVAL_SETTING)
+        self._update_subscription = omni.kit.app.get_app().get_update_event_stream().create_subscription_to_pop(
+            self._on_update, name="{{ extension_name }} outgoing messages"
+        )
+
+    def send(self, event_type: str, payload: dict, coalesce: bool = False) -> None:
+        """
+        Queue a message to the client.
+
+        Args:
+            event_type (str): Name of the outgoing event type.
+            payload (dict): Message payload.
+            coalesce (bool): Replace a queued message of the same type instead of sending both.
+        """
+        if coalesce:
+            key = event_type
+        else:
+            key = self._counter
+            self._counter += 1
+        # Replacing a dictionary value keeps its position, so a coalesced message stays ordered against the others.
+        self._pending[key] = (event_type, payload)
+
+    def flush(self) -> None:
+        """
+        Dispatch all queued messages and pump the message bus once.
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = {}
+        message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
+        for event_type, payload in pending.values():
+            message_bus.dispatch(carb.events.type_from_string(event_type), payload=payload)
+        message_bus.pump()
+
+    def _on_update(self, _event: carb.events.IEvent) -> None:
+        if not self._pending:
+            return
+        if self._flush_interval > 0 and time.monotonic() - self._last_flush < self._flush_interval:
+            return
+        self.flush()
+
+    def on_shutdown(self) -> None:
+        """
+        Send what is still queued and stop flushing.
+        """
+        self.flush()
+        self._update_subscription = None
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import carb
+import omni.kit.app
+from omni.kit.viewport.utility import get_active_viewport_camera_string
+from pxr import Gf, Sdf, Usd, UsdGeom
+
+
+def get_unloaded_payloads(stage) -> list:
+    """
+    Paths of the prims of `stage` that have a payload which is not loaded.
+    """
+    loaded = set(stage.GetLoadSet())
+    return [path for path in stage.FindLoadable() if path not in loaded]
+
+
+def prioritize_payloads(stage, paths: list, priority_paths=None) -> list:
+    """
+    Order the payload `paths` so that the most useful ones are loaded first.
+
+    Payloads at or below one of the `priority_paths` come first, in the order of `priority_paths`. The others follow by
+    their distance to the active camera, with the payloads in front of the camera before the ones behind it.
+    """
+    priority_paths = [Sdf.Path(path) for path in priority_paths or []]
+    xform_cache = UsdGeom.XformCache(Usd.TimeCode.Default())
+
+    camera_position = Gf.Vec3d(0.0, 0.0, 0.0)
+    camera_forward = Gf.Vec3d(0.0, 0.0, -1.0)
+    camera = stage.GetPrimAtPath(get_active_viewport_camera_string())
+    if camera:
+        camera_xform = xform_cache.GetLocalToWorldTransform(camera)
+        camera_position = camera_xform.ExtractTranslation()
+        camera_forward = camera_xform.TransformDir(Gf.Vec3d(0.0, 0.0, -1.0))
+
+    def key(path):
+        for index, priority_path in enumerate(priority_paths):
+            if path.HasPrefix(priority_path):
+                return (0, index, 0.0)
+        offset = xform_cache.GetLocalToWorldTransform(stage.GetPrimAtPath(path)).ExtractTranslation() - camera_position
+        return (1 if Gf.Dot(offset, camera_forward) >= 0 else 2, 0, offset.GetLength())
+
+    return sorted(paths, key=key)
+
+
+async def load_payloads(stage, paths: list, batch_size: int, on_progress=None) -> None:
+    """
+    Load the payloads of `paths` in batches of `batch_size`, one batch per frame, so the viewport keeps rendering.
+
+    Args:
+        stage (Usd.Stage): Stage to load the payloads of.
+        paths (list): Payload prim paths, in the order they should be loaded.
+        batch_size (int): Number of payloads loaded per frame.
+        on_progress (callable): Optional callback called with the fraction of payloads loaded after each batch.
+    """
+    batch_size = max(1, batch_size)
+    total = len(paths)
+    carb.log_info(f"Loading {total} payloads in batches of {batch_size}")
+    for start in range(0, total, batch_size):
+        stage.LoadAndUnload(set(paths[start:start + batch_size]), set(), Usd.LoadWithDescendants)
+        if on_progress:
+            on_progress(min(total, start + batch_size) / total)
+        await omni.kit.app.get_app().next_update_async()
@@ -9,34 +9,121 @@
 # its affiliates is strictly prohibited.
 
 import time
+from collections import OrderedDict
+from functools import partial
 import omni.ext
 import omni.kit.app
 import omni.usd
+import omni.client.utils
 import asyncio
 import carb
 import omni.log
+import carb.settings
 import omni.kit.livestream.messaging as messaging
 
+from .message_queue import MessageQueue
+from .payload_loading import get_unloaded_payloads, load_payloads, prioritize_payloads
+from .stage_prefetch import StagePrefetcher
+from .url_cache import StageUrlCache, get_file_stamp
+
+# Seconds the streaming manager has to stay idle before a loaded stage is reported to the client.
+LOAD_SETTLE_TIME_SETTING = "/exts/{{ extension_name }}/loadSettleTime"
+# Seconds to wait for the streaming manager before a stage is reported as loaded anyway. 0 waits forever.
+LOAD_TIMEOUT_SETTING = "/exts/{{ extension_name }}/loadTimeout"
+# Stage URLs prefetched when the extension starts.
+PREFETCH_STAGES_SETTING = "/exts/{{ extension_name }}/prefetchStages"
+# Number of prefetched stages whose layers are held open.
+PREFETCH_CACHE_SIZE_SETTING = "/exts/{{ extension_name }}/prefetchCacheSize"
+# Open stages without their payloads, then load the payloads in batches once the stage is shown.
+PROGRESSIVE_LOAD_SETTING = "/exts/{{ extension_name }}/progressiveLoad"
+# Number of payloads loaded per frame in progressive load mode.
+PROGRESSIVE_LOAD_BATCH_SIZE_SETTING = "/exts/{{ extension_name }}/progressiveLoadBatchSize"
+# Number of answered requests whose load metrics are kept for `loadMetricsRequest`.
+LOAD_METRICS_HISTORY = 32
+
+# Load phases in the order they are reached, each named after the mark that ends it.
+LOAD_PHASES = (
+    ("queued", "open_started"),  # waiting for a running open to return
+    ("resolve", "opening"),  # resolving the URL until the USD context starts opening the stage
+    ("open", "opened"),  # reading the layers and composing the stage
+    ("assets", "assets_loaded"),  # loading payloads, materials and other assets
+    ("streaming", "streamed"),  # RTX streaming textures and geometry
+)
+
+
+class LoadRequest:
+    """
+    A client's request to open a stage.
+    """
+
+    def __init__(self, request_id: str, url: str, resolved_url: str, progressive: bool = False, priority_paths=None):
+        self.request_id: str = request_id  # Id the client refers to the request by. Echoed in `openedStageResult`.
+        self.url: str = url  # URL as requested. Can be used in messaging with client.
+        self.resolved_url: str = resolved_url  # URL passed to the USD context. Should not be sent to the client.
+        self.progressive: bool = progressive  # Open without payloads and load them in batches afterwards.
+        self.priority_paths: list = priority_paths or []  # Prim paths whose payloads are loaded first.
+        self.is_opening: bool = False  # True while the USD context opens the stage, which cannot be interrupted.
+        self.timestamps: dict = {"received": time.monotonic()}  # Load phase marks, see `LOAD_PHASES`.
+
+    def mark(self, phase: str) -> None:
+        """
+        Record the monotonic time `phase` was reached. The first mark of a phase wins.
+        """
+        self.timestamps.setdefault(phase, time.monotonic())
+
+    def metrics(self) -> dict:
+        """
+        Milliseconds spent in each load phase that completed, and in total.
+        """
+        metrics = {}
+        previous = self.timestamps["received"]
+        for name, mark in LOAD_PHASES:
+            if mark not in self.timestamps:
+                continue
+            metrics[name] = round((self.timestamps[mark] - previous) * 1000.0, 3)
+            previous = self.timestamps[mark]
+        end = self.timestamps.get("completed", previous)
+        metrics["total"] = round((end - self.timestamps["received"]) * 1000.0, 3)
+        return metrics
+
 
 class LoadingManager:
 
-    def __init__(self):
+    def __init__(self, message_queue: MessageQueue):
         self._subscriptions = [] # Holds subscription pointers
+        self._message_queue: MessageQueue = message_queue
 
         # -- state variables
-        self._requested_stage_url: str = ""  # URL of stage load request. Can be used in messaging with client.
+        self._active_request: LoadRequest = None  # Request whose result is owed to the client.
+        self._pending_request: LoadRequest = None  # Latest request received while the active one was opening.
+        self._request_count: int = 0  # Used to generate ids for requests that do not provide one.
+        self._load_metrics: OrderedDict = OrderedDict()  # request id -> metrics of the latest answered requests
+        self._url_cache: StageUrlCache = StageUrlCache()  # requested url -> resolved url and opened stage identity
+        self._checking_request: LoadRequest = None  # Request for the open stage whose file is being checked
         self._stage_is_opening: bool = False
         self._opened_stage_url: str = "" # URL of loaded stage. Should not be used in messaging with client because it may reveal directory paths in environment where application runs.
-        self._stage_has_opened = False
-        self._streaming_manager_is_busy: bool = False
         self._persisted_stage: bool = False  # States if opened stage is opened from storage as in not a new unsaved stage
-        self._is_evaluating_loading_status: bool = False
+        self._assets_loaded = asyncio.Event()  # Set once the opening stage has loaded its assets
+        self._streaming_idle = asyncio.Event()  # Set while the RTX streaming manager is not busy
+        self._streaming_busy = asyncio.Event()  # Set while the RTX streaming manager is busy
+        self._streaming_idle.set()
+        self._evaluation_task: asyncio.Task = None  # Waits for the opened stage to finish loading
+
+        settings = carb.settings.get_settings()
+        self._settle_time: float = settings.get_as_float(LOAD_SETTLE_TIME_SETTING)
+        self._load_timeout: float = settings.get_as_float(LOAD_TIMEOUT_SETTING)
+        self._prefetcher: StagePrefetcher = StagePrefetcher(max_stages=settings.get_as_int(PREFETCH_CACHE_SIZE_SETTING))
+        self._progressive_load: bool = settings.get_as_bool(PROGRESSIVE_LOAD_SETTING)
+        self._payload_batch_size: int = settings.get_as_int(PROGRESSIVE_LOAD_BATCH_SIZE_SETTING)
+        self._payload_task: asyncio.Task = None  # Loads the payloads of a progressively loaded stage
 
         # -- register outgoing events/messages
         outgoing = [
             "openedStageResult",  # notify when USD Stage has loaded.
             "updateProgressAmount",  # Status bar event denoting progress
             "updateProgressActivity",  # Status bar event denoting current activity
+            "loadMetricsResponse",  # response to request for the load phase timings of recent requests
+            "prefetchStageResult",  # notify when a stage requested to be prefetched is warmed up
         ]
 
         for o in outgoing:
@@ -45,6 +132,8 @@ class LoadingManager:
         # -- register incoming events/messages
         incoming = {
             'openStageRequest': self._on_open_stage,  # request to open a stage
+            'loadMetricsRequest': self._on_load_metrics,  # request for the load phase timings of recent requests
+            'prefetchStageRequest': self._on_prefetch_stage,  # request to warm the caches for a stage
             "omni.kit.window.status_bar@progress": self._on_progress,  # internal event to capture progress status
             "omni.kit.window.status_bar@activity": self._on_activity,  # internal event to capture progress activity
         }
@@ -69,11 +158,18 @@ class LoadingManager:
             event_stream.create_subscription_to_pop_by_type(RTX_STREAMING_STATUS_EVENT, self._on_rxt_streaming_event)
         )
 
+        # -- warm the caches for the stages the application is expected to open
+        for url in settings.get(PREFETCH_STAGES_SETTING) or []:
+            self._prefetcher.prefetch(self._process_url(url)).add_done_callback(partial(self._on_prefetched, url))
+
     def _on_open_stage(self, event: carb.events.IEvent) -> None:
         """
         Handler for `openStageRequest` event.
 
         Starts loading a given URL, will send success if the layer is already loaded, and an error on any failure.
+
+        The payload may hold a `request_id` that is echoed in `openedStageResult`. Only the latest request is loaded:
+        a request arriving during another load supersedes it and the superseded request gets a `cancelled` result.
         """
         if event.type == carb.events.type_from_string("openStageRequest"):
 
@@ -82,47 +178,258 @@ class LoadingManager:
                     f"Unexpected message payload: missing \"url\" key. Payload: '{event.payload}'")
                 return
 
-            self._requested_stage_url = event.payload["url"]
-            carb.log_info(f"Received message to load '{self._requested_stage_url}'")
+            self._request_count += 1
+            request_id = str(event.payload["request_id"]) if "request_id" in event.payload else str(self._request_count)
+            requested_url = event.payload["url"]
+            carb.log_info(f"Received message to load '{requested_url}' (request: {request_id})")
+            progressive = (
+                bool(event.payload["progressive"]) if "progressive" in event.payload else self._progressive_load
+            )
+            priority_paths = list(event.payload["priority_paths"]) if "priority_paths" in event.payload else []
+            request = LoadRequest(
+                request_id,
+                requested_url,
+                self._url_cache.resolve(requested_url, self._process_url),
+                progressive=progressive,
+                priority_paths=priority_paths,
+            )
+            self._schedule(request)
 
-            def process_url(url):
-                # Using a single leading `.` to signify that the path is relative to the ${app} token's parent directory.
-                if url.startswith(("./", ".\\")):
-                    return carb.tokens.acquire_tokens_interface().resolve("${app}/.." + url[1:])
-                return url
+    @staticmethod
+    def _process_url(url: str) -> str:
+        # Using a single leading `.` to signify that the path is relative to the ${app} token's parent directory.
+        if url.startswith(("./", ".\\")):
+            return carb.tokens.acquire_tokens_interface().resolve("${app}/.." + url[1:])
+        return url
 
-            # Check to see if we've already loaded the current stage.
-            url = process_url(self._requested_stage_url)
+    def _on_prefetch_stage(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `prefetchStageRequest` event.
+
+        Warms the caches for the stage at the given URL in the background, so a later `openStageRequest` for it does
+        not wait on the network. Sends `prefetchStageResult` once done.
+        """
+        if event.type == carb.events.type_from_string("prefetchStageRequest"):
+            if "url" not in event.payload:
+                carb.log_error(
+                    f"Unexpected message payload: missing \"url\" key. Payload: '{event.payload}'")
+                return
+
+            requested_url = event.payload["url"]
+            carb.log_info(f"Received message to prefetch '{requested_url}'")
+
+            def on_done(future: asyncio.Future):
+                if future.cancelled():
+                    return
+                if future.exception():
+                    payload = {"url": requested_url, "result": "error", "error": str(future.exception())}
+                else:
+                    payload = {"url": requested_url, "result": "success", "error": '', **future.result()}
+                self._message_queue.send("prefetchStageResult", payload)
+
+            self._prefetcher.prefetch(self._process_url(requested_url)).add_done_callback(on_done)
 
+    @staticmethod
+    def _on_prefetched(url: str, future: asyncio.Future) -> None:
+        """
+        Report the failure of prefetching the stage at `url`, which nobody waits for.
+        """
+        if not future.cancelled() and future.exception():
+            carb.log_warn(f"Failed to prefetch stage {url}: {future.exception()}")
+
+    def _schedule(self, request: LoadRequest) -> None:
+        """
+        Load `request` as soon as possible, superseding any request that was not answered yet.
+        """
+        if self._checking_request:
+            self._send_result(self._checking_request, "cancelled", "Superseded by a newer openStageRequest")
+            self._checking_request = None
+
+        if self._pending_request:
+            self._send_result(self._pending_request, "cancelled", "Superseded by a newer openStageRequest")
+            self._pending_request = None
+
+        active = self._active_request
+        if active and omni.client.utils.equal_urls(request.resolved_url, active.resolved_url):
+            # The stage is already being loaded. The new request takes over the result of the running load.
+            self._send_result(active, "cancelled", "Superseded by a newer openStageRequest for the same stage")
+            request.is_opening = active.is_opening
+            self._active_request = request
+            return
+
+        if active and active.is_opening:
+            # Opening a stage cannot be interrupted. The request is loaded once the running open returns.
+            self._pending_request = request
+            return
+
+        if active:
+            # The stage is open and only waiting for its assets to stream in. Nobody wants it anymore.
+            self._send_result(active, "cancelled", "Superseded by a newer openStageRequest")
+            self._active_request = None
+            self._cancel_evaluation()
+            self._reset_state()
+        else:
+            # Check to see if we've already loaded the current stage.
             stage = omni.usd.get_context().get_stage()
             current_stage = stage.GetRootLayer().identifier if stage else ''
 
+            # If the stage was opened for this very URL before, only its file has to be checked for changes.
+            identity = self._url_cache.get_identity(request.url)
+            if identity and identity[0] == current_stage:
+                self._checking_request = request
+                asyncio.ensure_future(self._check_open_stage(request, identity[1]))
+                return
+
             # If we are, we don't need to reload the file, instead we'll just send the success message.
-            if omni.client.utils.equal_urls(url, current_stage):
-                carb.log_info(f'Client requested to open a stage that is already open: {url}')
-                message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                event_type = carb.events.type_from_string("openedStageResult")
-                payload = {"url": self._requested_stage_url, "result": "success", "error": ''}
-                message_bus.dispatch(event_type, payload=payload)
+            if omni.client.utils.equal_urls(request.resolved_url, current_stage):
+                carb.log_info(f'Client requested to open a stage that is already open: {request.resolved_url}')
+                self._send_result(request, "success")
                 self._reset_state()
+                asyncio.ensure_future(self._remember_identity(request.url, request.resolved_url, current_stage))
                 return
 
-            # Asynchronously load the incoming stage
-            async def open_stage():
-                carb.log_info(f'Opening stage per client request: {url}')
-                usd_context = omni.usd.get_context()
-                result, error = await usd_context.open_stage_async(url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)
-                if result is not True:
-                    # Send message to client that loading failed.
-                    carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
-                    message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                    event_type = carb.events.type_from_string("openedStageResult")
-                    payload = {"url": url, "result": "error", "error": error}
-                    message_bus.dispatch(event_type, payload=payload)
-                    self._reset_state()
+        self._active_request = request
+        request.is_opening = True
+        request.mark("open_started")
+        self._prefetcher.touch(request.resolved_url)
+        if request.progressive:
+            load_set = omni.usd.UsdContextInitialLoadSet.LOAD_NONE
+        else:
+            load_set = omni.usd.UsdContextInitialLoadSet.LOAD_ALL
+        asyncio.ensure_future(self._open_stage(request.resolved_url, load_set))
+
+    async def _check_open_stage(self, request: LoadRequest, stamp) -> None:
+        """
+        Acknowledge `request` for the stage that is already open, reloading it first if its file changed since it was
+        opened. Only the changed layers are read again. A file whose stamp cannot be read is taken as unchanged.
+
+        A reloaded stage is reported to the client once it finished streaming, like a stage that is opened.
+        """
+        current_stamp = await get_file_stamp(request.resolved_url)
+        if self._checking_request is not request:
+            # Superseded while checking, the request was answered already.
+            return
+        self._checking_request = None
+
+        stage = omni.usd.get_context().get_stage()
+        identity = self._url_cache.get_identity(request.url)
+        if not stage or not identity or stage.GetRootLayer().identifier != identity[0]:
+            # Another stage was opened in the meantime.
+            self._url_cache.forget_identity(request.url)
+            self._schedule(request)
+            return
+
+        if current_stamp is None or current_stamp == stamp:
+            carb.log_info(f'Client requested to open a stage that is already open: {request.resolved_url}')
+            self._send_result(request, "success")
+            return
 
-            asyncio.ensure_future(open_stage())
+        carb.log_info(f'Stage requested by the client changed since it was opened, reloading: {request.resolved_url}')
+        self._active_request = request
+        request.mark("open_started")
+        try:
+            stage.Reload()
+        except Exception as exc:
+            # Send message to client that loading failed, like a failed open.
+            carb.log_warn(f'The file that the client requested failed to reload: {request.resolved_url} (error: {exc})')
+            self._url_cache.forget_identity(request.url)
+            self._send_result(request, "error", str(exc))
+            self._active_request = None
+            self._reset_state()
+            return
+        request.mark("opened")
 
+        # Reloading is not an open, so no stage event reports the assets. They are loaded once the reload returns.
+        self._persisted_stage = True
+        self._assets_loaded.set()
+        request.mark("assets_loaded")
+        self._cancel_evaluation()
+        self._evaluation_task = asyncio.ensure_future(self._evaluate_load_status())
+
+    async def _remember_identity(self, url: str, resolved_url: str, identifier: str) -> None:
+        """
+        Remember that the stage with root layer `identifier` is open for the requested `url`. Without a stamp of its
+        file, changes could not be detected, so the stage is not remembered.
+        """
+        stamp = await get_file_stamp(resolved_url)
+        if stamp is None:
+            self._url_cache.forget_identity(url)
+            return
+        self._url_cache.set_identity(url, identifier, stamp)
+
+    async def _open_stage(self, url: str, load_set) -> None:
+        """
+        Asynchronously load the stage of the active request, then start the request that superseded it, if any.
+        """
+        carb.log_info(f'Opening stage per client request: {url}')
+        usd_context = omni.usd.get_context()
+        result, error = await usd_context.open_stage_async(url, load_set)
+
+        # The active request may have been replaced by a request for the same stage while opening.
+        request = self._active_request
+        if request is None:
+            # The request was answered while opening, only the request that superseded it is left to start.
+            if self._pending_request:
+                pending = self._pending_request
+                self._pending_request = None
+                self._schedule(pending)
+            return
+        request.is_opening = False
+        request.mark("opened")
+
+        if self._pending_request:
+            # Superseded while opening. Skip waiting for the assets and go straight to the latest request.
+            pending = self._pending_request
+            self._pending_request = None
+            self._send_result(request, "cancelled", "Superseded by a newer openStageRequest")
+            self._active_request = None
+            self._cancel_evaluation()
+            self._reset_state()
+            self._schedule(pending)
+            return
+
+        if result is not True:
+            # Send message to client that loading failed.
+            carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
+            self._send_result(request, "error", error)
+            self._active_request = None
+            self._reset_state()
+
+    def _send_result(self, request: LoadRequest, result: str, error: str = '') -> None:
+        """
+        Send the `openedStageResult` of `request` to the client, along with the time spent in each load phase.
+        """
+        request.mark("completed")
+        metrics = request.metrics()
+        self._load_metrics.pop(request.request_id, None)
+        self._load_metrics[request.request_id] = {"url": request.url, "result": result, "metrics": metrics}
+        while len(self._load_metrics) > LOAD_METRICS_HISTORY:
+            self._load_metrics.popitem(last=False)
+
+        payload = {
+            "url": request.url,
+            "request_id": request.request_id,
+            "result": result,
+            "error": error,
+            "metrics": metrics,
+        }
+        self._message_queue.send("openedStageResult", payload)
+
+    def _on_load_metrics(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `loadMetricsRequest` event.
+
+        Sends `loadMetricsResponse` with the load phase timings, in milliseconds, of the recently answered requests.
+        A `request_id` in the payload limits the response to that request.
+        """
+        if event.type == carb.events.type_from_string("loadMetricsRequest"):
+            request_id = str(event.payload["request_id"]) if "request_id" in event.payload else ''
+            requests = [
+                {"request_id": key, **value}
+                for key, value in self._load_metrics.items()
+                if not request_id or key == request_id
+            ]
+            self._message_queue.send("loadMetricsResponse", {"requests": requests})
 
     def _on_stage_event(self, event: carb.events.IEvent) -> None:
         """Manage extension state via the stage event stream. When a new stage is open we reload the data model
@@ -133,6 +440,9 @@ class LoadingManager:
         """
         if event.type == int(omni.usd.StageEventType.OPENING):
             self._stage_is_opening = True
+            self._cancel_payload_loading()
+            if self._active_request and self._active_request.is_opening:
+                self._active_request.mark("opening")
             payload: dict = event.payload.get_dict()
             if 'val' in payload.keys():
                 self._opened_stage_url = payload['val']
@@ -146,10 +456,13 @@ class LoadingManager:
             if not self._stage_is_opening:
                 return
             self._stage_is_opening = False
-            self._stage_has_opened = True
+            self._assets_loaded.set()
+            if self._active_request:
+                self._active_request.mark("assets_loaded")
 
             # Async call to evaluate opened state
-            asyncio.ensure_future(self._evaluate_load_status())
+            if self._persisted_stage and not (self._evaluation_task and not self._evaluation_task.done()):
+                self._evaluation_task = asyncio.ensure_future(self._evaluate_load_status())
             return
 
     def _on_rxt_streaming_event(self, event: carb.events.IEvent) -> None:
@@ -159,39 +472,108 @@ class LoadingManager:
         Args:
             event (carb.events.IEvent): Contains payload sender and type - https://docs.omniverse.nvidia.com/kit/docs/kit-manual/105.0/carb.events/carb.events.IEvent.html
         """
-        self._streaming_manager_is_busy = event.payload['isBusy']
+        self._set_streaming_busy(event.payload['isBusy'])
+
+    def _set_streaming_busy(self, is_busy: bool) -> None:
+        if is_busy:
+            self._streaming_idle.clear()
+            self._streaming_busy.set()
+        else:
+            self._streaming_busy.clear()
+            self._streaming_idle.set()
+
+    async def _wait_until_loaded(self) -> None:
+        """
+        Wait until the assets are loaded and the streaming manager stayed idle for the settle time.
+        """
+        await self._assets_loaded.wait()
+        while True:
+            await self._streaming_idle.wait()
+            if self._settle_time <= 0:
+                return
+            try:
+                # Streaming may resume right after a batch completes. Only an idle settle window counts as loaded.
+                await asyncio.wait_for(self._streaming_busy.wait(), self._settle_time)
+            except asyncio.TimeoutError:
+                return
 
     async def _evaluate_load_status(self):
         """
         If streaming manager is not busy and the stage is loaded from storage we notify client.
+
+        Resolves as soon as the streaming manager reports it is idle, rather than on a frame boundary. If it does not
+        become idle within the load timeout, the stage is reported as loaded with a warning.
         """
         # Only evaluate for stage loaded from storage.
         if not self._persisted_stage:
             return
 
-        if self._is_evaluating_loading_status:
-            return
-        self._is_evaluating_loading_status = True
-
-        # Wait until all dependencies have loaded by streaming manager
-        while self._streaming_manager_is_busy or not self._stage_has_opened:
-            await omni.kit.app.get_app().next_update_async()
-
-        for _ in range(2):
-            await omni.kit.app.get_app().next_update_async()
+        error = ''
+        try:
+            # Wait until all dependencies have loaded by streaming manager
+            await asyncio.wait_for(self._wait_until_loaded(), self._load_timeout or None)
+        except asyncio.TimeoutError:
+            error = f'Timed out after {self._load_timeout}s waiting for assets to finish streaming'
+            carb.log_warn(error)
 
         # Stage has loaded with all dependencies. Send message to client.
-        message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-        event_type = carb.events.type_from_string("openedStageResult")
-        url = self._requested_stage_url if self._requested_stage_url else '[obfuscated]'
-        carb.log_info(f'Sending message to client that stage has loaded: {url}')
-        payload = {"url": url, "result": "success", "error": ''}
-        message_bus.dispatch(event_type, payload=payload)
+        request = self._active_request
+        if request:
+            request.mark("streamed")
+            carb.log_info(f'Sending message to client that stage has loaded: {request.url}')
+            self._send_result(request, "success", error)
+            stage = omni.usd.get_context().get_stage()
+            if stage:
+                identifier = stage.GetRootLayer().identifier
+                asyncio.ensure_future(self._remember_identity(request.url, request.resolved_url, identifier))
+        else:
+            carb.log_info('Sending message to client that stage has loaded: [obfuscated]')
+            payload = {"url": '[obfuscated]', "request_id": '', "result": "success", "error": error}
+            self._message_queue.send("openedStageResult", payload)
+
+        # In progressive mode only the stage without its payloads is loaded so far.
+        progressive = request.progressive if request else self._progressive_load
+        priority_paths = request.priority_paths if request else []
 
         # reset
-        self._is_evaluating_loading_status = False
+        self._active_request = None
         self._reset_state()
 
+        if progressive:
+            self._start_payload_loading(priority_paths)
+
+    def _start_payload_loading(self, priority_paths: list) -> None:
+        """
+        Load the payloads that are not loaded yet in prioritized batches, reporting progress through
+        `updateProgressAmount`.
+        """
+        stage = omni.usd.get_context().get_stage()
+        paths = get_unloaded_payloads(stage) if stage else []
+        if not paths:
+            return
+        paths = prioritize_payloads(stage, paths, priority_paths)
+
+        def on_progress(fraction: float):
+            self._message_queue.send("updateProgressAmount", {"progress": fraction}, coalesce=True)
+
+        self._cancel_payload_loading()
+        self._payload_task = asyncio.ensure_future(
+            load_payloads(stage, paths, self._payload_batch_size, on_progress=on_progress)
+        )
+
+    def _cancel_payload_loading(self) -> None:
+        if self._payload_task and not self._payload_task.done():
+            self._payload_task.cancel()
+        self._payload_task = None
+
+    def _cancel_evaluation(self) -> None:
+        """
+        Stop waiting for the current stage to load, it is not wanted anymore.
+        """
+        if self._evaluation_task and not self._evaluation_task.done():
+            self._evaluation_task.cancel()
+        self._evaluation_task = None
+
     def _on_progress(self, event: carb.events.IEvent):
         """
         Handler for `omni.kit.window.status_bar@progress` event.
@@ -201,12 +583,10 @@ class LoadingManager:
         if not self._persisted_stage:
             return
         if event.type == carb.events.type_from_string("omni.kit.window.status_bar@progress"):
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            # Send progress message
-            carb.log_info('Sending message to client about loading progress.')
-            event_type = carb.events.type_from_string("updateProgressAmount")
+            # Queue progress message. Only the latest progress of a frame is sent.
+            carb.log_verbose('Queuing message to client about loading progress.')
             # event.payload.get_dict() is used to capture a copy of the incoming event's payload as a python dictionary
-            message_bus.dispatch(event_type, payload=event.payload.get_dict())
+            self._message_queue.send("updateProgressAmount", event.payload.get_dict(), coalesce=True)
 
     def _on_activity(self, event: carb.events.IEvent):
         """
@@ -217,12 +597,9 @@ class LoadingManager:
         if not self._persisted_stage:
             return
         if event.type == carb.events.type_from_string("omni.kit.window.status_bar@activity"):
-            carb.log_info('Storing message about loading activity.')
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            # Send activity message
-            carb.log_info('Sending message to client about loading activity.')
-            event_type = carb.events.type_from_string("updateProgressActivity")
-            message_bus.dispatch(event_type, payload=event.payload.get_dict())
+            # Queue activity message. Only the latest activity of a frame is sent.
+            carb.log_verbose('Queuing message to client about loading activity.')
+            self._message_queue.send("updateProgressActivity", event.payload.get_dict(), coalesce=True)
 
     def on_shutdown(self) -> None:
         """
@@ -230,13 +607,15 @@ class LoadingManager:
         """
         if self._subscriptions:
             self._subscriptions.clear()
+        self._cancel_evaluation()
+        self._cancel_payload_loading()
+        self._prefetcher.clear()
 
     def _reset_state(self):
         """
         Reset the internal state - ready for new stage to be loaded
         """
-        self._requested_stage_url = ""
         self._opened_stage_url = ""
-        self._stage_has_opened = False
-        self._streaming_manager_is_busy = False
+        self._assets_loaded.clear()
+        self._set_streaming_busy(False)
         self._persisted_stage = False
@@ -22,17 +22,72 @@ import omni.client.utils
 import omni.kit.livestream.messaging as messaging
 from omni.kit.viewport.utility import get_active_viewport_camera_string
 
-from pxr import UsdGeom, Usd
+from pxr import Sdf, UsdGeom
+
+from .camera_cache import CameraStateCache, DEFAULT_BOOKMARK
+from .hierarchy_index import HierarchyIndex
+from .message_queue import MessageQueue
+
+
+# Types a client can filter the children of a prim by.
+FILTER_TYPES = {
+    "USDGeom": UsdGeom.Mesh,
+    "mesh": UsdGeom.Mesh,
+    "xform": UsdGeom.Xform,
+    "scope": UsdGeom.Scope,
+}
+
+# Number of results returned for a `searchPrimsRequest` that does not provide a `limit`.
+DEFAULT_SEARCH_LIMIT = 100
+# Largest number of results a `searchPrimsRequest` returns, whatever `limit` it asks for.
+MAX_SEARCH_LIMIT = 1000
+
+# How `stageSelectionChanged` is sent: "full" sends the complete selection, "delta" sends the paths added to and
+# removed from the previous selection.
+SELECTION_SYNC_MODE_SETTING = "/exts/{{ extension_name }}/selectionSyncMode"
+
+# Number of stages, and of named camera bookmarks per stage, kept in the camera state cache.
+CAMERA_CACHE_STAGES_SETTING = "/exts/{{ extension_name }}/cameraCacheStages"
+CAMERA_CACHE_BOOKMARKS_SETTING = "/exts/{{ extension_name }}/cameraCacheBookmarks"
+
+
+def _to_count(name: str, value, minimum: int = 0) -> int:
+    """
+    Read the integer `value` of the payload field `name`. Raises a ValueError if it is not an integer of at least
+    `minimum`.
+    """
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    count = int(value)
+    if count < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, got {value!r}")
+    return count
+
+
+def _normalize_path(path: str) -> str:
+    """
+    The canonical spelling of the prim path `path`, as used by the hierarchy index. Empty if it is not a valid path.
+    """
+    return str(Sdf.Path(path.rstrip('/') or '/'))
 
 
 class StageManager:
 
-    def __init__(self):
+    def __init__(self, message_queue: MessageQueue):
 
         # Internal messaging state
+        self._message_queue: MessageQueue = message_queue
         self._is_external_update: bool = False
-        self._camera_attrs = {}
         self._subscriptions = []
+        settings = carb.settings.get_settings()
+        self._camera_cache: CameraStateCache = CameraStateCache(
+            max_stages=settings.get_as_int(CAMERA_CACHE_STAGES_SETTING),
+            max_bookmarks=settings.get_as_int(CAMERA_CACHE_BOOKMARKS_SETTING),
+        )
+        self._hierarchy: HierarchyIndex = HierarchyIndex(FILTER_TYPES)
+        self._selection_delta: bool = settings.get_as_string(SELECTION_SYNC_MODE_SETTING) == "delta"
+        self._selection_version: int = 0  # Version of the selection last sent to the client
+        self._selection: list = []  # Selection last sent to the client, the baseline of the next delta
 
         # -- register outgoing events/messages
         outgoing = [
@@ -40,6 +95,9 @@ class StageManager:
             "getChildrenResponse",       # response to request for children of a prim
             "makePrimsPickableResponse", # response to request for primitive being pickable.
             "resetStageResponse",        # response to the request to reset camera attributes
+            "saveCameraBookmarkResponse", # response to the request to store the camera state under a name
+            "searchPrimsResponse",       # response to request to search prims by name and type
+            "stageSelectionResync",      # complete selection, sent when the client's selection version diverged
         ]
 
         for o in outgoing:
@@ -51,6 +109,9 @@ class StageManager:
             'selectPrimsRequest' : self._on_select_prims,             # request to select a prim
             'makePrimsPickable' : self._on_make_pickable,             # request to make primitives pickable
             'resetStage' : self._on_reset_camera,                     # request to make primitives pickable
+            'saveCameraBookmark' : self._on_save_camera_bookmark,     # request to store the camera state under a name
+            'searchPrimsRequest' : self._on_search_prims,             # request to search prims by name and type
+            'stageSelectionResyncRequest' : self._on_selection_resync, # request for the complete selection
         }
 
         for event_type, handler in incoming.items():
@@ -71,60 +132,163 @@ class StageManager:
         """
         Collect any children of the given `prim_path`, potentially filtered by `filters`
         """
-        stage = omni.usd.get_context().get_stage()
-        prim = stage.GetPrimAtPath(prim_path)
+        return self.get_children_page(prim_path, filters=filters)["children"]
 
-        filter_types = {
-            "USDGeom": UsdGeom.Mesh,
-            "mesh": UsdGeom.Mesh,
-            "xform": UsdGeom.Xform,
-            "scope": UsdGeom.Scope,
-        }
+    def get_children_page(self, prim_path, filters=None, offset=0, limit=None):
+        """
+        Collect one page of the children of the given `prim_path`, potentially filtered by `filters`.
+
+        Only the children within `offset` and `offset + limit` are described, so the cost of a request scales with
+        the page size rather than with the number of children. A `limit` of `None` or `0` returns all remaining
+        children.
+
+        Returns a dictionary holding the `children` of the page, the `total` number of children passing the filters
+        and the `next_cursor` to request the following page with. `next_cursor` is empty on the last page.
+        """
+        if not self._update_hierarchy():
+            return {"children": [], "total": 0, "next_cursor": ""}
+
+        prim_path = _normalize_path(prim_path)
+        if prim_path not in self._hierarchy:
+            return {"children": [], "total": 0, "next_cursor": ""}
+
+        listed = self._hierarchy.get_children(
+            prim_path, filters=filters, exclude=lambda name: self._is_hidden(prim_path, name)
+        )
+        total = len(listed)
+
+        offset = max(0, offset)
+        end = total if not limit else min(total, offset + limit)
 
         children = []
-        for child in prim.GetChildren():
-            # If a child doesn't pass any filter, we skip it.
-            if filters is not None:
-                if not any(child.IsA(filter_types[filt]) for filt in filters if filt in filter_types):
-                    continue
-
-            child_name = child.GetName()
-            child_path = str(prim.GetPath())
-            # Skipping over cameras
-            if child_name.startswith('OmniverseKit_'):
-                continue
-            # Also skipping rendering primitives.
-            if prim_path == '/' and child_name == 'Render':
-                continue
-            child_path = child_path if not child_path == '/' else ''
-            carb.log_info(f'child_path: {child_path}')
-            info = {"name": child_name, "path": f'{child_path}/{child_name}'}
+        for child_path in listed[offset:end]:
+            info = {"name": child_path.rsplit('/', 1)[-1], "path": child_path}
 
-            # We return an empty list here to indicate that children are available, but
-            # the current app does not support pagination, so we use this to lazy load the stage tree.
-            if child.GetChildren():
+            # We return an empty list here to indicate that children are available, the client lazy loads them
+            # with a further request.
+            if self._hierarchy.has_children(child_path):
                 info["children"] = []
 
             children.append(info)
 
-        return children
+        next_cursor = str(end) if end < total else ""
+        return {"children": children, "total": total, "next_cursor": next_cursor}
+
+    def search_prims(self, query: str, filters=None, limit: int = DEFAULT_SEARCH_LIMIT) -> tuple:
+        """
+        Collect the prims whose name matches `query`, potentially filtered by `filters`.
+
+        `query` is a case insensitive name substring or glob. Returns the matching prims and whether the results were
+        cut off at `limit`.
+        """
+        if not self._update_hierarchy():
+            return [], False
+
+        def is_hidden(path: str) -> bool:
+            if path == '/Render' or path.startswith('/Render/'):
+                return True
+            return '/OmniverseKit_' in path
+
+        paths, truncated = self._hierarchy.search(query, filters=filters, limit=limit, exclude=is_hidden)
+        return [{"name": path.rsplit('/', 1)[-1], "path": path} for path in paths], truncated
+
+    def _update_hierarchy(self) -> bool:
+        """
+        Make sure the hierarchy index belongs to the current stage. Returns False when there is no stage.
+        """
+        stage = omni.usd.get_context().get_stage()
+        if not stage:
+            return False
+        # The index is normally built when the stage opens. This covers stages opened before the extension started.
+        if self._hierarchy.stage != stage:
+            self._hierarchy.build(stage)
+        return True
+
+    @staticmethod
+    def _is_hidden(prim_path: str, child_name: str) -> bool:
+        """
+        Whether the child `child_name` of `prim_path` is kept from the client.
+        """
+        # Skipping over cameras
+        if child_name.startswith('OmniverseKit_'):
+            return True
+        # Also skipping rendering primitives.
+        if prim_path == '/' and child_name == 'Render':
+            return True
+        return False
+
+    @staticmethod
+    def _parse_page_request(payload) -> tuple:
+        """
+        Read the `offset` and `limit` of a `getChildrenRequest` payload.
+
+        An opaque `cursor`, as returned in `next_cursor` of a previous response, takes precedence over `offset`.
+        Raises a ValueError for values that are not non-negative integers.
+        """
+        offset = _to_count("offset", payload.get("offset", 0) or 0)
+        cursor = payload.get("cursor", "")
+        if cursor:
+            offset = _to_count("cursor", cursor)
+        limit = payload.get("limit", None)
+        return offset, _to_count("limit", limit) if limit else None
 
     def _on_get_children(self, event: carb.events.IEvent) -> None:
         """
         Handler for the `getChildrenRequest` event
         Collects a filtered collection of a given primitives children.
+
+        The request may carry `offset`/`limit` or the `cursor` returned by a previous response to page through
+        prims with many children. The response holds the `total` child count and the `next_cursor`, which is empty
+        once the last page was sent.
         """
         if event.type == carb.events.type_from_string("getChildrenRequest"):
             carb.log_info(f"Received message to return list of a prim\'s children")
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("getChildrenResponse")
-            children = self.get_children(prim_path=event.payload["prim_path"], filters=event.payload["filters"])
+            request: dict = event.payload.get_dict()
+            try:
+                offset, limit = self._parse_page_request(request)
+            except (TypeError, ValueError) as e:
+                carb.log_error(f"Unexpected paging values in message payload: {e}. Payload: '{request}'")
+                return
+            page = self.get_children_page(
+                prim_path=request["prim_path"],
+                filters=request.get("filters", None),
+                offset=offset,
+                limit=limit,
+            )
+            payload = {
+                "prim_path" : request["prim_path"],
+                "children": page["children"],
+                "offset": offset,
+                "total": page["total"],
+                "next_cursor": page["next_cursor"],
+            }
+            self._message_queue.send("getChildrenResponse", payload)
+
+    def _on_search_prims(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for the `searchPrimsRequest` event.
+
+        Finds the prims whose name contains the `query` substring or matches it as a glob, optionally restricted to the
+        types in `filters`. At most `limit` results, capped at `MAX_SEARCH_LIMIT`, are returned; `truncated` tells the
+        client there were more.
+        """
+        if event.type == carb.events.type_from_string("searchPrimsRequest"):
+            request: dict = event.payload.get_dict()
+            query = request.get("query", "")
+            carb.log_info(f"Received message to search prims matching '{query}'")
+            try:
+                limit = _to_count("limit", request.get("limit", DEFAULT_SEARCH_LIMIT), minimum=1)
+            except (TypeError, ValueError) as e:
+                carb.log_error(f"Unexpected limit in message payload: {e}. Payload: '{request}'")
+                return
+            limit = min(limit, MAX_SEARCH_LIMIT)
+            prims, truncated = self.search_prims(query, filters=request.get("filters", None), limit=limit)
             payload = {
-                "prim_path" : event.payload["prim_path"],
-                "children": children
+                "query": query,
+                "prims": prims,
+                "truncated": truncated,
             }
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+            self._message_queue.send("searchPrimsResponse", payload)
 
     def _on_select_prims(self, event: carb.events.IEvent) -> None:
         """
@@ -143,6 +307,46 @@ class StageManager:
             sel.clear_selected_prim_paths()
             sel.set_selected_prim_paths(new_selection, True)
 
+    def _on_selection_resync(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `stageSelectionResyncRequest` event.
+
+        Sent by a client in "delta" selection sync mode when the `base_version` of a `stageSelectionChanged` does not
+        match the version it holds. Responds with the complete selection and its version in `stageSelectionResync`.
+        """
+        if event.type == carb.events.type_from_string("stageSelectionResyncRequest"):
+            self._selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
+            payload = {"version": self._selection_version, "prims": self._selection}
+            self._message_queue.send("stageSelectionResync", payload)
+
+    def _send_selection(self, selection: list) -> None:
+        """
+        Send `selection` to the client in `stageSelectionChanged`.
+
+        In "delta" mode only the paths added to and removed from the previously sent selection are sent, along with
+        the new `version` and the `base_version` they apply to.
+        """
+        if not self._selection_delta:
+            self._message_queue.send("stageSelectionChanged", {"prims": selection})
+            return
+
+        selected = set(selection)
+        baseline = set(self._selection)
+        added = [path for path in selection if path not in baseline]
+        removed = [path for path in self._selection if path not in selected]
+        self._selection = selection
+        if not added and not removed:
+            return
+
+        payload = {
+            "version": self._selection_version + 1,
+            "base_version": self._selection_version,
+            "added": added,
+            "removed": removed,
+        }
+        self._selection_version += 1
+        self._message_queue.send("stageSelectionChanged", payload)
+
     def _on_stage_event(self, event):
         """
         Hanles all stage related events.
@@ -150,90 +354,176 @@ class StageManager:
         `omni.usd.StageEventType.SELECTION_CHANGED`: Informs the StreamerApp that the selection has changed.
         `omni.usd.StageEventType.ASSETS_LOADED`: Informs the StreamerApp that a stage has finished loading its assets.
         `omni.usd.StageEventType.OPENED`: On stage opened, we collect some of the camera properties to allow for them to be reset.
+        `omni.usd.StageEventType.CLOSED`: On stage closed, we drop the hierarchy index of the stage.
 
         """
         if event.type == int(omni.usd.StageEventType.SELECTION_CHANGED):
             # If the selection changed came from an external event, we don't need to let the streaming client know
             # because it initiated the change and is already aware.
+            selection = omni.usd.get_context().get_selection().get_selected_prim_paths()
             if self._is_external_update:
                 self._is_external_update = False
+                # The client already holds this selection, so it becomes the baseline of the next delta.
+                self._selection = selection
             else:
-                message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-                event_type = carb.events.type_from_string("stageSelectionChanged")
-                payload = {"prims": omni.usd.get_context().get_selection().get_selected_prim_paths()}
-                message_bus.dispatch(event_type, payload=payload)
-                message_bus.pump()
-                carb.log_info(f"Selection changed: Path to USD prims currently selected = {omni.usd.get_context().get_selection().get_selected_prim_paths()}")
+                self._send_selection(selection)
+                carb.log_info(f"Selection changed: Path to USD prims currently selected = {selection}")
 
         # elif event.type == int(omni.usd.StageEventType.ASSETS_LOADED):
         elif event.type == int(omni.usd.StageEventType.OPENED):
             stage = omni.usd.get_context().get_stage()
             stage_url = stage.GetRootLayer().identifier if stage else ''
 
+            # Index the hierarchy once so that browsing the stage does not traverse it again.
+            self._hierarchy.build(stage)
+
             if stage_url:
                 # Set the entire stage to not be pickable.
                 ctx = omni.usd.get_context()
                 ctx.set_pickable("/", False)
-                # Clear before using, so that we're sure the data is only from the new stage.
-                self._camera_attrs.clear()
                 # Capture the active camera's camera data, used to reset the scene to a known good state.
                 if (prim := ctx.get_stage().GetPrimAtPath(get_active_viewport_camera_string())):
-                    for attr in prim.GetAttributes():
-                        self._camera_attrs[attr.GetName()] = attr.Get()
+                    self._camera_cache.capture(stage_url, prim)
+
+        elif event.type == int(omni.usd.StageEventType.CLOSED):
+            self._hierarchy.clear()
 
     def _on_reset_camera(self, event: carb.events.IEvent):
         """
         Handler for `resetStage` event.
 
-        Resets the camera back to values collected when the stage was opened.
+        Resets the camera back to the bookmark `name` of the payload, or to the values collected when the stage was
+        opened if no name is given. Only the attributes that changed since are authored.
         A success message is sent if all attributes are succesfully reset, and error message is set otherwise.
         """
         if event.type == carb.events.type_from_string("resetStage"):
             ctx = omni.usd.get_context()
             stage = ctx.get_stage()
+            name = event.payload["name"] if "name" in event.payload else DEFAULT_BOOKMARK
             try:
+                stage_url = stage.GetRootLayer().identifier
+                if not self._camera_cache.has(stage_url, name):
+                    raise KeyError(f"No camera bookmark named '{name}' for the current stage")
                 # Reset the camera.
                 # The camera lives on the session layer, which has a higher opinion than the root stage.
                 # So we need to explicitly target the session layer when resetting the camera's attributes.
-                camera_prim = ctx.get_stage().GetPrimAtPath(get_active_viewport_camera_string())
-                edit_context = Usd.EditContext(stage, Usd.EditTarget(stage.GetSessionLayer()))
-                with edit_context:
-                    for name, value in self._camera_attrs.items():
-                        attr = camera_prim.GetAttribute(name)
-                        attr.Set(value)
+                camera_prim = stage.GetPrimAtPath(get_active_viewport_camera_string())
+                self._camera_cache.restore(stage_url, camera_prim, stage.GetSessionLayer(), name=name)
             except Exception as e:
                 payload = {"result": "error", "error": str(e)}
             else:
                 payload = {"result": "success", "error": ""}
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("resetStageResponse")
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+            self._message_queue.send("resetStageResponse", payload)
+
+    def _on_save_camera_bookmark(self, event: carb.events.IEvent):
+        """
+        Handler for `saveCameraBookmark` event.
+
+        Stores the transform and lens of the active camera under the `name` of the payload, to be restored with a
+        `resetStage` request naming it. Sends 'saveCameraBookmarkResponse' with the bookmark names of the stage.
+        """
+        if event.type == carb.events.type_from_string("saveCameraBookmark"):
+            stage = omni.usd.get_context().get_stage()
+            stage_url = stage.GetRootLayer().identifier if stage else ''
+            try:
+                if "name" not in event.payload or not event.payload["name"]:
+                    raise KeyError("Unexpected message payload: missing \"name\" key")
+                camera_prim = stage.GetPrimAtPath(get_active_viewport_camera_string()) if stage else None
+                if not camera_prim:
+                    raise RuntimeError("No active camera to bookmark")
+                self._camera_cache.capture(stage_url, camera_prim, name=event.payload["name"])
+            except Exception as e:
+                payload = {"result": "error", "error": str(e), "bookmarks": self._camera_cache.names(stage_url)}
+            else:
+                payload = {"result": "success", "error": "", "bookmarks": self._camera_cache.names(stage_url)}
+            self._message_queue.send("saveCameraBookmarkResponse", payload)
+
+    def make_pickable(self, paths=None, include=None, exclude=None) -> list:
+        """
+        Enable viewport selection for the subtrees of `paths` and of the prims matching the `include` path globs, then
+        disable it again for the subtrees of the prims matching the `exclude` path globs.
+
+        The targets are resolved against the hierarchy index first. Subtrees already covered by an enabled ancestor are
+        skipped, so each prim is updated at most once. A failing path does not stop the others from being applied.
+
+        Returns a list of `{"path", "error"}` dictionaries describing the paths that could not be updated.
+        """
+        failures = []
+        if not self._update_hierarchy():
+            return [{"path": path, "error": "No stage is open"} for path in paths or []]
+
+        enable = set()
+        for path in paths or []:
+            normalized = _normalize_path(path)
+            if normalized in self._hierarchy:
+                enable.add(normalized)
+            else:
+                failures.append({"path": path, "error": "Prim not found"})
+        for pattern in include or []:
+            enable.update(self._hierarchy.match(pattern))
+        disable = set()
+        for pattern in exclude or []:
+            disable.update(self._hierarchy.match(pattern))
+
+        ctx = omni.usd.get_context()
+        for pickable, targets in ((True, enable), (False, disable)):
+            for path in self._collapse_subtrees(targets):
+                try:
+                    ctx.set_pickable(path, pickable)
+                except Exception as e:
+                    failures.append({"path": path, "error": str(e)})
+        return failures
+
+    @staticmethod
+    def _collapse_subtrees(paths: set) -> list:
+        """
+        The paths of `paths` that have no ancestor in `paths`, parents first.
+        """
+        def depth(path: str) -> int:
+            return path.count('/') if path != '/' else 0
+
+        kept = set()
+        for path in sorted(paths, key=depth):
+            ancestor = path
+            while ancestor not in kept and ancestor != '/':
+                ancestor = ancestor.rsplit('/', 1)[0] or '/'
+            if ancestor in kept:
+                continue
+            kept.add(path)
+        return sorted(kept, key=depth)
 
     def _on_make_pickable(self, event: carb.events.IEvent):
         """
         Handler for `makePrimsPickable` event.
 
-        Enables viewport selection for the provided primitives.
-        Sends 'makePrimsPickableResponse' back to streamer with current success status.
+        Enables viewport selection for the subtrees of the provided `paths` and of the prims matching the optional
+        `include` path globs, excluding the subtrees matching the optional `exclude` path globs.
+        Sends 'makePrimsPickableResponse' back to streamer with the overall status and a `failures` list holding the
+        `path` and `error` of each path that could not be updated.
         """
         if event.type == carb.events.type_from_string("makePrimsPickable"):
-            message_bus = omni.kit.app.get_app().get_message_bus_event_stream()
-            event_type = carb.events.type_from_string("makePrimsPickableResponse")
+            request: dict = event.payload.get_dict()
             try:
-                paths = event.payload['paths'] or []
-                for path in paths:
-                    omni.usd.get_context().set_pickable(path, True)
+                failures = self.make_pickable(
+                    paths=request.get("paths", None),
+                    include=request.get("include", None),
+                    exclude=request.get("exclude", None),
+                )
             except Exception as e:
-                payload = {"result": "error", "error": str(e)}
+                payload = {"result": "error", "error": str(e), "failures": []}
             else:
-                payload = {"result": "success", "error": ""}
-            message_bus.dispatch(event_type, payload=payload)
-            message_bus.pump()
+                if failures:
+                    error = f"{len(failures)} path(s) could not be made pickable"
+                    payload = {"result": "error", "error": error, "failures": failures}
+                else:
+                    payload = {"result": "success", "error": "", "failures": []}
+            self._message_queue.send("makePrimsPickableResponse", payload)
 
 
     def on_shutdown(self):
         # Reseting the state.
         self._subscriptions.clear()
         self._is_external_update: bool = False
-        self._camera_attrs.clear()
+        self._camera_cache.clear()
+        self._hierarchy.clear()
+        self._selection = []
@@ -0,0 +1,91 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+from collections import OrderedDict
+
+import carb
+import omni.client
+from pxr import UsdUtils
+
+# Number of non-layer assets (textures, materials, ...) read at the same time while prefetching a stage.
+MAX_CONCURRENT_READS = 8
+
+
+class StagePrefetcher:
+    """
+    Warms the caches for stages that are likely to be opened.
+
+    Prefetching a stage opens its root layer and every layer it depends on, including payloads, on a worker thread and
+    keeps them open. Opening the stage later finds these layers in the layer registry instead of reading them again.
+    The remaining assets, such as textures, are fetched once into the local cache of the client library, without
+    loading their content into memory, so they are served from that cache.
+
+    The layers of at most `max_stages` stages are held, least recently prefetched or used are released first.
+    """
+
+    def __init__(self, max_stages: int = 4):
+        self._max_stages = max(1, max_stages)
+        self._layers: OrderedDict = OrderedDict()  # stage url -> layers held open for the stage
+        self._tasks: dict = {}  # stage url -> running prefetch task
+
+    def prefetch(self, url: str) -> asyncio.Future:
+        """
+        Start prefetching the stage at `url`, unless it is prefetched already.
+
+        Returns a future resolving to a dictionary with the number of `layers` and `assets` that were warmed.
+        """
+        if url in self._tasks:
+            return self._tasks[url]
+        task = asyncio.ensure_future(self._prefetch(url))
+        self._tasks[url] = task
+        task.add_done_callback(lambda _: self._tasks.pop(url, None))
+        return task
+
+    def touch(self, url: str) -> None:
+        """
+        Mark the prefetched stage `url` as used, so it is released last.
+        """
+        if url in self._layers:
+            self._layers.move_to_end(url)
+
+    def clear(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._layers.clear()
+
+    async def _prefetch(self, url: str) -> dict:
+        carb.log_info(f"Prefetching stage: {url}")
+        loop = asyncio.get_event_loop()
+        layers, assets, unresolved = await loop.run_in_executor(None, UsdUtils.ComputeAllDependencies, url)
+        if not layers:
+            raise RuntimeError(f"Could not open layer: {url}")
+        for path in unresolved:
+            carb.log_warn(f"Unresolved dependency while prefetching {url}: {path}")
+
+        self._layers.pop(url, None)
+        self._layers[url] = layers
+        while len(self._layers) > self._max_stages:
+            self._layers.popitem(last=False)
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_READS)
+
+        async def read(asset: str) -> bool:
+            async with semaphore:
+                result, _ = await omni.client.get_local_file_async(asset)
+            if result != omni.client.Result.OK:
+                carb.log_warn(f"Could not prefetch asset {asset}: {result}")
+                return False
+            return True
+
+        warmed = await asyncio.gather(*(read(asset) for asset in assets))
+        carb.log_info(f"Prefetched stage {url}: {len(layers)} layers, {sum(warmed)} of {len(assets)} assets")
+        return {"layers": len(layers), "assets": sum(warmed)}
@@ -0,0 +1,50 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+
+import omni.kit.test
+from pxr import Gf, Usd, UsdGeom
+
+from {{ python_module }}.camera_cache import DEFAULT_BOOKMARK, CameraStateCache
+
+
+class TestCameraStateCache(omni.kit.test.AsyncTestCase):
+    def _create_camera(self):
+        stage = Usd.Stage.CreateInMemory()
+        camera = UsdGeom.Camera.Define(stage, "/Camera")
+        camera.AddTranslateOp().Set(Gf.Vec3d(0, 0, 10))
+        camera.GetFocalLengthAttr().Set(50.0)
+        return stage, camera.GetPrim()
+
+    # Test that a restore authors the captured values that changed since
+    async def test_capture_restore(self):
+        stage, prim = self._create_camera()
+        cache = CameraStateCache()
+        cache.capture("stage.usd", prim)
+
+        UsdGeom.Camera(prim).GetFocalLengthAttr().Set(24.0)
+        self.assertEqual(cache.restore("stage.usd", prim, stage.GetSessionLayer()), 1)
+        self.assertEqual(UsdGeom.Camera(prim).GetFocalLengthAttr().Get(), 50.0)
+
+    # Test that the bookmark being captured is kept, even when the default one alone fills the limit
+    async def test_capture_keeps_new_bookmark(self):
+        _, prim = self._create_camera()
+        cache = CameraStateCache(max_bookmarks=1)
+        cache.capture("stage.usd", prim)
+        cache.capture("stage.usd", prim, name="first")
+        self.assertEqual(cache.names("stage.usd"), [DEFAULT_BOOKMARK, "first"])
+
+        cache.capture("stage.usd", prim, name="second")
+        self.assertEqual(cache.names("stage.usd"), [DEFAULT_BOOKMARK, "second"])
+
+        cache = CameraStateCache(max_bookmarks=1)
+        cache.capture("stage.usd", prim, name="first")
+        cache.capture("stage.usd", prim, name="second")
+        self.assertEqual(cache.names("stage.usd"), ["second"])
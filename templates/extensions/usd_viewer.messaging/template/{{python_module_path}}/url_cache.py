@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+from collections import OrderedDict
+
+import omni.client
+
+
+async def get_file_stamp(url: str):
+    """
+    Modification time, size and hash of the file at `url`, or None if it cannot be queried.
+
+    The stamp changes whenever the file is written, so comparing stamps tells whether a file changed on the server.
+    """
+    result, entry = await omni.client.stat_async(url)
+    if result != omni.client.Result.OK:
+        return None
+    return (entry.modified_time, entry.size, entry.hash)
+
+
+class StageUrlCache:
+    """
+    Remembers, per URL as requested by the client, the URL it resolves to and the identity of the stage opened for it.
+
+    The identity is the root layer identifier of the opened stage and the stamp of its file at that time. Entries are
+    evicted least recently used first.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self._max_entries = max(1, max_entries)
+        self._entries: OrderedDict = OrderedDict()  # requested url -> [resolved url, layer identifier, file stamp]
+
+    def resolve(self, url: str, resolver) -> str:
+        """
+        The resolved form of `url`. `resolver` is only called the first time a URL is seen.
+        """
+        entry = self._entries.get(url)
+        if entry is None:
+            entry = [resolver(url), "", None]
+            self._entries[url] = entry
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(url)
+        return entry[0]
+
+    def get_identity(self, url: str):
+        """
+        The layer identifier and file stamp of the stage last opened for `url`, or None if it is not known.
+        """
+        entry = self._entries.get(url)
+        if entry is None or not entry[1]:
+            return None
+        return entry[1], entry[2]
+
+    def set_identity(self, url: str, identifier: str, stamp) -> None:
+        entry = self._entries.get(url)
+        if entry is not None:
+            entry[1] = identifier
+            entry[2] = stamp
+
+    def forget_identity(self, url: str) -> None:
+        self.set_identity(url, "", None)
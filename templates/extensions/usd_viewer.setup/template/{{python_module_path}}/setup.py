@@ -23,12 +23,15 @@ from omni.kit.mainwindow import get_main_window
 from omni.kit.quicklayout import QuickLayout
 from omni.kit.viewport.utility import get_viewport_from_window_name
 
+from .startup_readiness import LAYOUT_APPLIED, MAIN_WINDOW_READY, StartupReadiness
+
 COMMAND_MACRO_SETTING = "/exts/omni.kit.command_macro.core/"
 COMMAND_MACRO_FILE_SETTING = COMMAND_MACRO_SETTING + "macro_file"
+# When enabled, the messaging extension loads the payloads of a stage opened without them in prioritized batches.
+PROGRESSIVE_LOAD_SETTING = "/exts/{{ extra_extension_name }}/progressiveLoad"
 
 async def _load_layout(layout_file: str):
     """this private methods just help loading layout, you can use it in the Layout Menu"""
-    await omni.kit.app.get_app().next_update_async()  # type: ignore
     QuickLayout.load_file(layout_file)
 
     # Set viewport to FILL
@@ -44,6 +47,7 @@ class SetupExtension(omni.ext.IExt):
 
         # get the settings
         self._settings = carb.settings.get_settings()
+        self._readiness = StartupReadiness()
 
         # get auto load stage name
         stage_url = self._settings.get_as_string("/app/auto_load_usd")
@@ -66,9 +70,8 @@ class SetupExtension(omni.ext.IExt):
         # Menubar
         main_menu_bar = get_main_window().get_main_menu_bar()
         main_menu_bar.visible = False
-        # few frame delay to allow automatic Layout of window that want their own positions
-        for _i in range(4):
-            await omni.kit.app.get_app().next_update_async()  # type: ignore
+        # allow automatic Layout of window that want their own positions
+        await self._readiness.wait(MAIN_WINDOW_READY)
 
         settings = carb.settings.get_settings()
         # setup the Layout for your app
@@ -78,7 +81,11 @@ class SetupExtension(omni.ext.IExt):
         layout_name = settings.get("/app/layout/name")
         layout_file = Path(layouts_path).joinpath(f"{layout_name}.json")
 
-        asyncio.ensure_future(_load_layout(f"{layout_file}"))
+        try:
+            await _load_layout(f"{layout_file}")
+        finally:
+            # a failed layout must not hold back the stage
+            self._readiness.reach(LAYOUT_APPLIED)
 
         # using imgui directly to adjust some color and Variable
         imgui = _imgui.acquire_imgui()
@@ -87,12 +94,18 @@ class SetupExtension(omni.ext.IExt):
         imgui.push_style_var_float(_imgui.StyleVar.DockSplitterSize, 2)
 
     async def __open_stage(self, url):
-        # 10 frame delay to allow Layout
-        for i in range(5):
-            await omni.kit.app.get_app().next_update_async()  # type: ignore
+        # allow Layout
+        await self._readiness.wait(LAYOUT_APPLIED)
+
+        # In progressive mode the stage is shown before its payloads are loaded.
+        if carb.settings.get_settings().get_as_bool(PROGRESSIVE_LOAD_SETTING):
+            load_set = omni.usd.UsdContextInitialLoadSet.LOAD_NONE
+        else:
+            load_set = omni.usd.UsdContextInitialLoadSet.LOAD_ALL
 
         usd_context = omni.usd.get_context()
-        await usd_context.open_stage_async(url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)  # type: ignore
+        await usd_context.open_stage_async(url, load_set)  # type: ignore
 
     def on_shutdown(self):
-        pass
+        self._readiness.destroy()
+        self._readiness = None
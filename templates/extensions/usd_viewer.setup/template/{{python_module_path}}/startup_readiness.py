@@ -0,0 +1,101 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+from typing import Optional
+
+import carb
+import omni.kit.app
+import omni.usd
+
+# The main window is built and docked, so a layout applied now is not overridden by the one of omni.kit.mainwindow
+MAIN_WINDOW_READY = "main_window_ready"
+# The renderer delivered its first frame of the stage
+RTX_READY = "rtx_ready"
+# The startup layout is applied
+LAYOUT_APPLIED = "layout_applied"
+# Seconds a startup task waits for a milestone before it runs anyway, for sessions that never reach it, like one that
+# never renders
+MILESTONE_TIMEOUT = 10.0
+
+_readiness: Optional["StartupReadiness"] = None
+
+
+def get_startup_readiness() -> Optional["StartupReadiness"]:
+    """The readiness of the running startup, or None if the extension is not started."""
+    return _readiness
+
+
+class StartupReadiness:
+    """
+    Awaitable milestones of the app startup.
+
+    Startup tasks await the milestone they depend on with `wait` instead of waiting a fixed number of frames, so they
+    run on the update the milestone is reached. `MAIN_WINDOW_READY` and `RTX_READY` are reached from Kit events,
+    `LAYOUT_APPLIED` is reached by whoever applies the layout, with `reach`. A milestone reached stays reached. Waits
+    time out, so a milestone that is never reached delays the tasks waiting for it but does not block them.
+    """
+
+    def __init__(self):
+        global _readiness
+        self._milestones = {}  # milestone -> future, done once reached
+        app = omni.kit.app.get_app()
+        self._app_ready_sub = None
+        if app.is_app_ready():
+            self.reach(MAIN_WINDOW_READY)
+        else:
+            self._app_ready_sub = app.get_startup_event_stream().create_subscription_to_pop_by_type(
+                omni.kit.app.EVENT_APP_READY, lambda _: self.reach(MAIN_WINDOW_READY), name="StartupReadiness"
+            )
+        self._new_frame_sub = omni.usd.get_context().get_rendering_event_stream().create_subscription_to_pop_by_type(
+            int(omni.usd.StageRenderingEventType.NEW_FRAME), lambda _: self.reach(RTX_READY), name="StartupReadiness"
+        )
+        _readiness = self
+
+    def _get_future(self, milestone: str) -> asyncio.Future:
+        if milestone not in self._milestones:
+            self._milestones[milestone] = asyncio.get_event_loop().create_future()
+        return self._milestones[milestone]
+
+    def is_reached(self, milestone: str) -> bool:
+        return self._get_future(milestone).done()
+
+    def reach(self, milestone: str) -> None:
+        """Mark `milestone` as reached, which resumes the tasks waiting for it."""
+        future = self._get_future(milestone)
+        if not future.done():
+            future.set_result(None)
+        if milestone == MAIN_WINDOW_READY:
+            self._app_ready_sub = None
+        elif milestone == RTX_READY:
+            self._new_frame_sub = None
+
+    async def wait(self, milestone: str, timeout: Optional[float] = MILESTONE_TIMEOUT) -> bool:
+        """
+        Wait until `milestone` is reached, or for at most `timeout` seconds when not None. Returns whether it was
+        reached.
+        """
+        try:
+            await asyncio.wait_for(asyncio.shield(self._get_future(milestone)), timeout)
+        except asyncio.TimeoutError:
+            carb.log_warn(f"Startup milestone {milestone} not reached after {timeout}s, continuing without it")
+            return False
+        return True
+
+    def destroy(self) -> None:
+        """Stop tracking the milestones. The tasks still waiting are cancelled."""
+        global _readiness
+        self._app_ready_sub = None
+        self._new_frame_sub = None
+        for future in self._milestones.values():
+            future.cancel()
+        self._milestones.clear()
+        if _readiness is self:
+            _readiness = None